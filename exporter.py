@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+
+# --- Общий модуль экспорта табличных результатов ---
+# Все три скрипта сохраняют итоговые таблицы через этот модуль. Строки записываются порциями
+# по мере их получения (из генератора), поэтому вся таблица никогда не собирается в памяти,
+# а один проход по данным заполняет сразу все выбранные форматы.
+#
+# Поддерживаемые форматы:
+#   parquet  - колоночный сжатый формат (нужна библиотека pyarrow), лучший выбор для больших таблиц;
+#   jsonl.gz - по одной JSON-записи на строку, сжато gzip; не требует сторонних библиотек;
+#   csv      - обычный CSV в UTF-8;
+#   xlsx     - Excel (через openpyxl в потоковом режиме). Самый медленный формат, поэтому только по запросу.
+#
+# Набор форматов задается переменной окружения EXPORT_FORMATS, например:
+#   EXPORT_FORMATS=parquet,xlsx python task3_sitemap_finder.py
+
+# `csv`, `gzip`, `json` - стандартные библиотеки для записи CSV, сжатия и JSON.
+import csv
+import gzip
+import json
+# `os` - для путей, размеров файлов и чтения переменных окружения.
+import os
+# `time` - для замера времени записи.
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Форматы по умолчанию. Excel сюда намеренно не входит.
+DEFAULT_EXPORT_FORMATS = ('parquet',)
+# Сколько строк накапливается перед записью очередной порции.
+EXPORT_CHUNK_SIZE = 10_000
+# Максимум строк на листе Excel (включая заголовок). При превышении создается следующий лист.
+EXCEL_MAX_ROWS = 1_048_576
+# Наибольшее по модулю целое, которое float64 хранит точно. Колонку с большими целыми нельзя расширить до дробных.
+FLOAT64_EXACT_INT = 2 ** 53
+
+
+# --- 1. ЗАПИСЫВАЮЩИЕ КЛАССЫ ДЛЯ КАЖДОГО ФОРМАТА ---
+# У всех одинаковый интерфейс: конструктор открывает файл, `write_chunk` дописывает порцию строк,
+# `close` завершает запись, `abort` вызывается после ошибки записи - закрывает и удаляет недописанный
+# файл. При `recover=True` (для запасного формата) `abort` возвращает уже записанные строки из полностью
+# записанных порций, если файл можно прочитать обратно, а если нельзя - оставляет файл с этими порциями
+# и возвращает None.
+# `column_types` (колонка -> 'string', 'int64', 'float64', 'bool') нужны форматам с типизированной схемой
+# и для чтения CSV обратно.
+
+class _FileWriter:
+    """Общая для простых форматов реализация `abort`: закрыть файл и удалить его."""
+    _path: str
+
+    def abort(self, recover: bool = False) -> Optional[Iterator[Tuple[Any, ...]]]:
+        try:
+            self.close()
+        except Exception:
+            pass
+        _remove_quietly(self._path)
+        return iter(())
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _parse_csv_value(text: str, column_type: Optional[str]) -> Any:
+    """
+    Значение из CSV с учетом типа колонки. Пустая строка в типизированной колонке - это None;
+    значения колонок без типа (и не подходящие под тип) остаются строками, как они записаны в CSV.
+    """
+    if column_type in (None, 'string'):
+        return text
+    if text == '':
+        return None
+    try:
+        if column_type == 'bool' and text in ('True', 'False'): return text == 'True'
+        if column_type == 'int64': return int(text)
+        if column_type == 'float64': return float(text)
+    except ValueError:
+        pass
+    return text
+
+
+class _CsvWriter(_FileWriter):
+    def __init__(self, path: str, columns: Sequence[str], column_types: Optional[Dict[str, str]] = None):
+        self._path = path
+        self._types = [(column_types or {}).get(name) for name in columns]
+        self._rows = 0  # Строк в полностью записанных порциях: после ошибки в файле может остаться часть порции.
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write_chunk(self, rows: List[Sequence[Any]]):
+        self._writer.writerows(rows)
+        self._rows += len(rows)
+
+    def close(self):
+        self._file.close()
+
+    def abort(self, recover: bool = False) -> Optional[Iterator[Tuple[Any, ...]]]:
+        """При `recover=True` возвращает генератор строк, прочитанных из файла, - файл удаляется, когда он дочитан."""
+        if not recover:
+            return super().abort()
+        try:
+            self.close()
+        except Exception:
+            return super().abort()
+        return self._read_back()
+
+    def _read_back(self) -> Iterator[Tuple[Any, ...]]:
+        try:
+            with open(self._path, encoding='utf-8', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)  # Заголовок.
+                for row in islice(reader, self._rows):
+                    yield tuple(_parse_csv_value(text, column_type) for text, column_type in zip(row, self._types))
+        finally:
+            _remove_quietly(self._path)
+
+
+class _JsonlGzWriter(_FileWriter):
+    def __init__(self, path: str, columns: Sequence[str], column_types: Optional[Dict[str, str]] = None):
+        self._path = path
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._columns = list(columns)
+
+    def write_chunk(self, rows: List[Sequence[Any]]):
+        self._file.writelines(json.dumps(dict(zip(self._columns, row)), ensure_ascii=False, default=str) + '\n'
+                              for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """
+    Parquet хранит один тип на колонку для всего файла. Типы берутся из `column_types`, а для остальных
+    колонок - из первой порции данных. Каждая порция приводится к схеме файла только "безопасно"
+    (без потери данных). Если порция не помещается в колонку, тип которой определялся по данным
+    (например, 3.5 в целочисленной колонке), тип расширяется (int64 -> float64, иначе -> string),
+    и уже записанные данные переписываются. Если в колонке встречались целые, которые float64 не хранит
+    точно (больше 2**53 по модулю), дробные в ней расширяют ее сразу до строк.
+    """
+
+    def __init__(self, path: str, columns: Sequence[str], column_types: Optional[Dict[str, str]] = None):
+        # Импортируем здесь, чтобы без pyarrow работали остальные форматы.
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        self._pa, self._pc, self._pq = pa, pc, pq
+        self._path = path
+        self._columns = list(columns)
+        self._fixed = {name: pa.type_for_alias(alias) for name, alias in (column_types or {}).items()}
+        self._schema = None
+        self._writer = None  # Создается по первой порции, когда известны типы всех колонок.
+        self._max_abs_int: Dict[str, int] = {}  # Колонка -> наибольшее по модулю записанное в нее целое.
+
+    def _to_arrays(self, rows: List[Sequence[Any]]) -> list:
+        """Превращает порцию строк в колонки Arrow. Вложенные структуры (списки, словари) сохраняются как JSON-строки."""
+        pa = self._pa
+        arrays = []
+        for name, values in zip(self._columns, zip(*rows)):
+            values = [json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, (list, dict, tuple, set)) else v
+                      for v in values]
+            target = self._fixed.get(name) or (self._schema.field(name).type if self._schema else None)
+            if target is not None and pa.types.is_string(target):
+                values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+            try:
+                arrays.append(pa.array(values))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Смесь несовместимых значений внутри одной порции - храним колонку как строки.
+                arrays.append(pa.array([v if v is None or isinstance(v, str) else str(v) for v in values]))
+        return arrays
+
+    def _widen(self, name: str, old, new):
+        """Тип, в который без потерь помещаются значения обоих типов."""
+        pa = self._pa
+        if old == new or pa.types.is_null(new): return old
+        if pa.types.is_null(old): return new
+        numeric = (pa.types.is_integer, pa.types.is_floating)
+        if (any(f(old) for f in numeric) and any(f(new) for f in numeric)
+                and self._max_abs_int.get(name, 0) <= FLOAT64_EXACT_INT):
+            return pa.float64()
+        return pa.string()
+
+    def _track_ints(self, name: str, array):
+        """Запоминает наибольшее по модулю целое в колонке (нужно, чтобы не расширять ее до float64 с потерями)."""
+        if not self._pa.types.is_integer(array.type):
+            return
+        bounds = self._pc.min_max(array)
+        if bounds['min'].is_valid:
+            self._max_abs_int[name] = max(self._max_abs_int.get(name, 0),
+                                          abs(bounds['min'].as_py()), abs(bounds['max'].as_py()))
+
+    def _cast(self, arrays: list, schema):
+        return self._pa.Table.from_arrays(arrays, names=self._columns).cast(schema, safe=True)
+
+    def _rewrite(self, schema):
+        """
+        Закрывает файл и переписывает уже записанные данные с новой (расширенной) схемой.
+        Старый файл удаляется только после успешной перезаписи, а при ошибке возвращается на место -
+        так `abort` сможет прочитать из него уже записанные строки.
+        """
+        self._writer.close()
+        self._writer = None
+        old_path = self._path + '.old'
+        os.replace(self._path, old_path)
+        writer = None
+        try:
+            writer = self._pq.ParquetWriter(self._path, schema, compression='zstd')
+            for batch in self._pq.ParquetFile(old_path).iter_batches():
+                writer.write_table(self._pa.Table.from_batches([batch]).cast(schema, safe=True))
+        except Exception:
+            try:
+                if writer is not None: writer.close()
+            except Exception:
+                pass
+            os.replace(old_path, self._path)
+            raise
+        _remove_quietly(old_path)
+        self._writer, self._schema = writer, schema
+
+    def write_chunk(self, rows: List[Sequence[Any]]):
+        pa = self._pa
+        arrays = self._to_arrays(rows)
+        if self._schema is None:
+            # Колонка без заданного типа, в первой порции которой одни пустые значения, получила бы тип null -
+            # храним такие колонки как строки.
+            self._schema = pa.schema([
+                pa.field(name, self._fixed.get(name) or (pa.string() if pa.types.is_null(array.type) else array.type))
+                for name, array in zip(self._columns, arrays)])
+            self._writer = self._pq.ParquetWriter(self._path, self._schema, compression='zstd')
+        # Колонки, тип которых определялся по данным, расширяем заранее, если новая порция в них не помещается
+        # (на "безопасное" приведение тут полагаться нельзя: например, 2 в колонке bool стало бы True).
+        # Заданные вызывающим кодом типы не меняем: если значение в них не помещается, приведение
+        # ниже завершится ошибкой, и `export_rows` перейдет на запасной формат.
+        for name, array in zip(self._columns, arrays):
+            self._track_ints(name, array)
+        widened = pa.schema([
+            field if field.name in self._fixed else pa.field(field.name, self._widen(field.name, field.type, array.type))
+            for field, array in zip(self._schema, arrays)])
+        if widened != self._schema:
+            self._rewrite(widened)
+        self._writer.write_table(self._cast(arrays, self._schema))
+
+    def close(self):
+        if self._writer is None:
+            # Пустая таблица - записываем файл только со схемой (заданные типы или строки).
+            pa = self._pa
+            schema = pa.schema([pa.field(name, self._fixed.get(name, pa.string())) for name in self._columns])
+            self._pq.write_table(schema.empty_table(), self._path)
+        else:
+            self._writer.close()
+
+    def abort(self, recover: bool = False) -> Iterator[Tuple[Any, ...]]:
+        """
+        Завершает файл после ошибки (все полностью записанные порции в нем остаются читаемыми).
+        При `recover=True` возвращает генератор уже записанных строк - файл удаляется, когда он дочитан.
+        """
+        try:
+            if self._writer is not None: self._writer.close()
+        except Exception:
+            recover = False
+        if not recover:
+            _remove_quietly(self._path)
+            return iter(())
+        return self._read_back()
+
+    def _read_back(self) -> Iterator[Tuple[Any, ...]]:
+        try:
+            # Файла нет, если ошибка случилась еще в первой порции.
+            if os.path.exists(self._path):
+                for batch in self._pq.ParquetFile(self._path).iter_batches():
+                    yield from zip(*(column.to_pylist() for column in batch.columns))
+        finally:
+            _remove_quietly(self._path)
+
+
+class _ExcelWriter(_FileWriter):
+    """
+    Прочитать потоковую книгу обратно нельзя, поэтому после ошибки (`abort(recover=True)`) файл с уже
+    записанными порциями сохраняется как есть. Чтобы в нем не оказалась половина порции, значения всей
+    порции проверяются до записи первой ее строки.
+    """
+
+    def __init__(self, path: str, columns: Sequence[str], column_types: Optional[Dict[str, str]] = None):
+        from openpyxl import Workbook
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        from openpyxl.utils.exceptions import IllegalCharacterError
+        self._illegal_re, self._illegal_error = ILLEGAL_CHARACTERS_RE, IllegalCharacterError
+        self._path = path
+        self._columns = list(columns)
+        # Потоковый (write-only) режим: строки не держатся в памяти, а сразу уходят во временный файл.
+        self._workbook = Workbook(write_only=True)
+        self._sheet = None
+        self._sheet_rows = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self._sheet = self._workbook.create_sheet(f"data_{len(self._workbook.worksheets) + 1}")
+        self._sheet.append(self._columns)
+        self._sheet_rows = 1
+
+    def write_chunk(self, rows: List[Sequence[Any]]):
+        # Excel не умеет хранить вложенные структуры - превращаем их в строку.
+        prepared = [[value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+                     for value in row] for row in rows]
+        for row in prepared:
+            for value in row:
+                # Управляющие символы Excel запрещены; openpyxl обнаружил бы их посреди записи порции.
+                if isinstance(value, str) and self._illegal_re.search(value):
+                    raise self._illegal_error(f"недопустимый в Excel символ в значении {value[:50]!r}")
+        for row in prepared:
+            if self._sheet_rows >= EXCEL_MAX_ROWS:
+                self._new_sheet()
+            self._sheet.append(row)
+            self._sheet_rows += 1
+
+    def close(self):
+        self._workbook.save(self._path)
+
+    def abort(self, recover: bool = False) -> Optional[Iterator[Tuple[Any, ...]]]:
+        if not recover:
+            return super().abort()
+        try:
+            self.close()
+        except Exception:
+            return super().abort()
+        return None
+
+
+# Формат -> (класс записи, название для вывода в консоль).
+EXPORT_WRITERS = {
+    'parquet': (_ParquetWriter, 'Parquet'),
+    'jsonl.gz': (_JsonlGzWriter, 'JSONL.gz'),
+    'csv': (_CsvWriter, 'CSV'),
+    'xlsx': (_ExcelWriter, 'Excel'),
+}
+
+
+# --- 2. ВЫБОР ФОРМАТОВ ---
+
+def get_export_formats() -> List[str]:
+    """
+    Возвращает список форматов из переменной окружения EXPORT_FORMATS (через запятую)
+    или форматы по умолчанию. Неизвестные форматы пропускаются с предупреждением.
+    """
+    requested = os.environ.get('EXPORT_FORMATS')
+    formats = [f.strip().lower() for f in requested.split(',') if f.strip()] if requested else list(DEFAULT_EXPORT_FORMATS)
+    unknown = [f for f in formats if f not in EXPORT_WRITERS]
+    for f in unknown:
+        print(f"  - ⚠️ Неизвестный формат экспорта '{f}' пропущен. Доступны: {', '.join(EXPORT_WRITERS)}")
+    return [f for f in formats if f not in unknown]
+
+
+# --- 3. ЭКСПОРТ ---
+
+def _open_fallback(base_path: str, columns: Sequence[str], column_types: Optional[Dict[str, str]],
+                   written: Iterable[Sequence[Any]], chunk: List[Sequence[Any]], chunk_size: int) -> Optional[dict]:
+    """
+    Открывает запасной jsonl.gz-файл посреди экспорта и записывает в него строки, уже записанные
+    в файл, который не удалось дописать (`written`), а затем текущую порцию `chunk`.
+    """
+    path = f"{base_path}.jsonl.gz"
+    print("  - Использую запасной формат JSONL.gz.")
+    started = time.perf_counter()
+    count, writer = 0, None
+    written = iter(written)
+    try:
+        writer = _JsonlGzWriter(path, columns, column_types)
+        while True:
+            rows = list(islice(written, chunk_size))
+            if not rows: break
+            writer.write_chunk(rows)
+            count += len(rows)
+        writer.write_chunk(chunk)
+        count += len(chunk)
+    except Exception as e:
+        print(f"  - ❌ Не удалось записать запасной JSONL.gz-файл {path}: {e}")
+        if writer is not None: writer.abort()
+        for _ in written: pass  # Дочитываем уже записанные строки до конца, чтобы недописанный файл был удален.
+        return None
+    return {'writer': writer, 'path': path, 'title': 'JSONL.gz', 'rows': count, 'seconds': time.perf_counter() - started}
+
+
+def export_rows(base_path: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                formats: Optional[Sequence[str]] = None, chunk_size: int = EXPORT_CHUNK_SIZE,
+                column_types: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    Записывает таблицу во все выбранные форматы за один проход по `rows`.
+
+    :param base_path: Путь без расширения, например 'analysis_results/task3_documentation_urls'.
+                      Расширение добавляется по формату.
+    :param columns: Названия колонок.
+    :param rows: Строки таблицы (кортежи/списки в порядке `columns`). Может быть генератором -
+                 строки забираются порциями по `chunk_size` и сразу записываются.
+    :param formats: Форматы из `EXPORT_WRITERS`. По умолчанию - `get_export_formats()`.
+    :param column_types: Типы колонок для форматов со схемой (Parquet): колонка -> 'string', 'int64',
+                         'float64' или 'bool'. Колонки без типа определяются по данным.
+    :return: Отчет по каждому сохраненному файлу: путь, формат, число строк, время, размер и признак
+             `partial` - файл сохранен не полностью (запись прервалась ошибкой, а прочитать его обратно
+             для переноса в запасной формат нельзя).
+    """
+    formats = list(formats) if formats is not None else get_export_formats()
+    os.makedirs(os.path.dirname(base_path) or '.', exist_ok=True)
+
+    # Открываем все файлы. Если формат недоступен (например, нет pyarrow), просто пропускаем его.
+    writers = {}
+    for fmt in formats:
+        writer_class, title = EXPORT_WRITERS[fmt]
+        path = f"{base_path}.{fmt}"
+        started = time.perf_counter()
+        try:
+            writers[fmt] = {'writer': writer_class(path, columns, column_types), 'path': path, 'title': title,
+                            'rows': 0, 'seconds': time.perf_counter() - started}
+        except ImportError as e:
+            print(f"  - ❌ Формат {title} недоступен (не установлена библиотека: {e.name}). Установите ее или выберите другой формат.")
+        except Exception as e:
+            print(f"  - ❌ Не удалось создать {title}-файл {path}: {e}")
+
+    # Если ни один формат не открылся (например, по умолчанию parquet, а pyarrow нет) - используем запасной jsonl.gz.
+    if not writers and 'jsonl.gz' not in formats:
+        print("  - Использую запасной формат JSONL.gz.")
+        return export_rows(base_path, columns, rows, ['jsonl.gz'], chunk_size, column_types)
+
+    # Записываем данные порциями, отдавая каждую порцию всем открытым файлам.
+    # В каждом файле считаем строки отдельно: после ошибки в запасной файл попадает только часть таблицы.
+    partial = []  # Файлы, сохраненные частично (их нельзя прочитать обратно для переноса в запасной формат).
+    iterator = iter(rows)
+    while writers:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk: break
+        for fmt, state in list(writers.items()):
+            started = time.perf_counter()
+            try:
+                state['writer'].write_chunk(chunk)
+            except Exception as e:
+                print(f"  - ❌ Ошибка записи {state['title']}-файла {state['path']}: {e}")
+                del writers[fmt]
+                # Недописанный файл удаляем. Если это был последний формат - как и при ошибке открытия,
+                # переходим на запасной jsonl.gz, перенося в него уже записанные строки.
+                # Если файл нельзя прочитать обратно, он остается с уже записанными порциями, а в запасной
+                # файл идут только строки начиная с текущей порции.
+                if not writers and 'jsonl.gz' not in formats:
+                    written = state['writer'].abort(recover=True)
+                    if written is None:
+                        partial.append((fmt, state))
+                        print(f"  - ⚠️ {state['title']}-файл {state['path']} сохранен частично: {state['rows']} строк.")
+                    else:
+                        print(f"  - Недописанный файл {state['path']} удален.")
+                    fallback = _open_fallback(base_path, columns, column_types, written or (), chunk, chunk_size)
+                    if fallback: writers['jsonl.gz'] = fallback
+                else:
+                    state['writer'].abort()
+                    print(f"  - Недописанный файл {state['path']} удален.")
+                continue
+            state['rows'] += len(chunk)
+            state['seconds'] += time.perf_counter() - started
+
+    # Закрываем файлы и собираем отчет: время записи и итоговый размер.
+    report = [{'format': fmt, 'path': state['path'], 'rows': state['rows'], 'seconds': round(state['seconds'], 3),
+               'bytes': os.path.getsize(state['path']), 'partial': True} for fmt, state in partial]
+    for fmt, state in writers.items():
+        started = time.perf_counter()
+        try:
+            state['writer'].close()
+        except Exception as e:
+            print(f"  - ❌ Не удалось сохранить {state['title']}-файл {state['path']}: {e}")
+            continue
+        seconds = state['seconds'] + time.perf_counter() - started
+        size = os.path.getsize(state['path'])
+        report.append({'format': fmt, 'path': state['path'], 'rows': state['rows'],
+                       'seconds': round(seconds, 3), 'bytes': size, 'partial': False})
+        print(f"  - ✅ {state['title']}-файл успешно сохранен: {state['path']} "
+              f"({state['rows']} строк, {size / 1024:.1f} КБ, {seconds:.2f} с)")
+    return report
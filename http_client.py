@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+# --- Общий HTTP-клиент для всех скриптов ---
+# Все сетевые запросы проекта проходят через этот модуль, поэтому у всех скриптов одинаковые
+# заголовки, тайм-ауты и повторы, а соединения переиспользуются:
+#   - сессии `requests` с пулом keep-alive соединений, по одной на хост (без повторных TLS-рукопожатий);
+#   - автоматические повторы с нарастающей паузой при сетевых сбоях и ответах 429/5xx;
+#   - robots.txt скачивается один раз на хост и кэшируется, `Crawl-delay` соблюдается для "вежливых" запросов;
+#   - необязательный дисковый кэш ответов, учитывающий заголовок Cache-Control
+#     (включается переменной окружения HTTP_CACHE_DIR);
+#   - счетчики запросов, скачанных по сети байтов (до распаковки) и попаданий в кэш.
+
+# `hashlib` - для имен файлов дискового кэша (хэш от URL).
+import hashlib
+# `io` - для "пустого" потока у ответов из кэша (вместо сетевого соединения).
+import io
+# `json` - для хранения метаданных закэшированных ответов.
+import json
+# `os` - для путей и переменных окружения.
+import os
+# `threading` - модуль используется из нескольких потоков (task1, pipeline.py), общие данные защищены блокировками.
+import threading
+# `time` - для соблюдения Crawl-delay и срока свежести кэша.
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+# `RobotFileParser` - стандартный разбор robots.txt.
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+
+# --- 1. НАСТРОЙКИ ---
+
+# Заголовки, которые отправляют все скрипты. `User-Agent` говорит сайту, что мы — обычный браузер Chrome.
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36'}
+# Тайм-аут запроса по умолчанию (в секундах).
+DEFAULT_TIMEOUT = 15
+# Число повторов при сбое и множитель паузы между ними (0.5 -> 0.5 с, 1 с, 2 с, ...).
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+# Коды ответа, при которых запрос стоит повторить.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Сколько keep-alive соединений держать открытыми на один хост.
+HTTP_POOL_SIZE = 20
+# Папка дискового кэша ответов. Если переменная окружения не задана, кэш выключен.
+HTTP_CACHE_DIR = os.environ.get('HTTP_CACHE_DIR')
+
+# Счетчики для статистики (изменяются только под блокировкой).
+_stats = {'requests': 0, 'bytes': 0, 'cache_hits': 0, 'revalidated': 0}
+_stats_lock = threading.Lock()
+# Сессии по хостам, общая сессия для "разовых" запросов к множеству хостов, robots.txt по хостам
+# и время последнего "вежливого" запроса к хосту.
+_sessions: Dict[str, requests.Session] = {}
+_shared_session: Optional[requests.Session] = None
+_robots: Dict[str, RobotFileParser] = {}
+_host_locks: Dict[str, threading.Lock] = {}
+_last_request_at: Dict[str, float] = {}
+_registry_lock = threading.Lock()
+
+
+def _count(**increments):
+    with _stats_lock:
+        for key, value in increments.items():
+            _stats[key] += value
+
+
+def _host_of(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+# --- 2. СЕССИИ ---
+
+def new_session() -> requests.Session:
+    """
+    Создает новую сессию со стандартными заголовками, пулом соединений и автоматическими повторами.
+    Используется, когда сессии нужно собственное состояние (например, cookies из браузера).
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    retry = Retry(total=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF, status_forcelist=RETRY_STATUSES,
+                  allowed_methods=frozenset({'GET', 'HEAD'}), respect_retry_after_header=True,
+                  # После исчерпания повторов возвращаем последний ответ, а не исключение:
+                  # пусть вызывающий код сам решает, что делать с кодом 5xx.
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """Возвращает общую сессию для хоста из `url` (создает ее при первом обращении)."""
+    host = _host_of(url)
+    with _registry_lock:
+        if host not in _sessions:
+            _sessions[host] = new_session()
+        return _sessions[host]
+
+
+def get_shared_session() -> requests.Session:
+    """
+    Одна общая сессия для запросов к множеству разных хостов по одному-два запроса на каждый
+    (например, проверка внешних ссылок в task1). Отдельная сессия на каждый такой хост копилась бы
+    без ограничений, а здесь пул хранит соединения только к `HTTP_POOL_SIZE` последним хостам.
+    """
+    global _shared_session
+    with _registry_lock:
+        if _shared_session is None:
+            _shared_session = new_session()
+        return _shared_session
+
+
+# --- 3. ДИСКОВЫЙ КЭШ ОТВЕТОВ ---
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """'max-age=60, no-cache' -> {'max-age': '60', 'no-cache': None}"""
+    directives = {}
+    for part in value.split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+def _cache_paths(url: str):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return os.path.join(HTTP_CACHE_DIR, f"{key}.json"), os.path.join(HTTP_CACHE_DIR, f"{key}.body")
+
+
+def _load_cached(url: str):
+    """Возвращает (метаданные, тело) закэшированного ответа или (None, None)."""
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None, None
+
+
+def _freshness(headers) -> Optional[int]:
+    """Сколько секунд ответ можно отдавать без обращения к серверу, или None, если его нужно перепроверять."""
+    directives = _parse_cache_control(headers.get('Cache-Control', ''))
+    if 'no-cache' in directives or 'max-age' not in directives:
+        return None
+    try:
+        return int(directives['max-age'])
+    except (TypeError, ValueError):
+        return None
+
+
+def _store_cached(url: str, response: requests.Response):
+    """Сохраняет успешный ответ, если Cache-Control это разрешает и его можно будет использовать повторно."""
+    directives = _parse_cache_control(response.headers.get('Cache-Control', ''))
+    if response.status_code != 200 or 'no-store' in directives:
+        return
+    max_age = _freshness(response.headers)
+    # Без срока свежести и без ETag/Last-Modified ответ нельзя ни отдать, ни перепроверить - не храним.
+    if max_age is None and not (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+        return
+    # Тело хранится уже распакованным, поэтому заголовки о сжатии и длине не сохраняем.
+    headers = {k: v for k, v in response.headers.items() if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')}
+    meta_path, body_path = _cache_paths(url)
+    try:
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        with open(body_path, 'wb') as f:
+            f.write(response.content)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'url': response.url, 'status': response.status_code, 'headers': headers,
+                       'stored_at': time.time(), 'max_age': max_age}, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"      - ⚠️ Не удалось сохранить ответ в кэш: {e}")
+
+
+def _response_from_cache(meta: dict, body: bytes) -> requests.Response:
+    """Собирает объект `requests.Response` из закэшированных данных."""
+    response = requests.Response()
+    response.status_code = meta['status']
+    response.reason = 'OK'
+    response.url = meta['url']
+    response.headers = CaseInsensitiveDict(meta['headers'])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response._content = body
+    # Тело уже прочитано, а вместо сетевого соединения - пустой поток, чтобы `close()` и `with` работали как обычно.
+    response._content_consumed = True
+    response.raw = io.BytesIO()
+    response.from_cache = True
+    return response
+
+
+# --- 4. ROBOTS.TXT И CRAWL-DELAY ---
+
+def get_robots(url: str) -> RobotFileParser:
+    """
+    Возвращает разобранный robots.txt для хоста из `url`. Скачивается один раз на хост.
+    Если robots.txt недоступен, считается, что ограничений нет.
+    """
+    host = _host_of(url)
+    with _registry_lock:
+        if host in _robots:
+            return _robots[host]
+    parser = RobotFileParser(f"{host}/robots.txt")
+    try:
+        r = fetch(f"{host}/robots.txt", timeout=10)
+        if r.status_code == 200:
+            parser.parse(r.text.splitlines())
+        else:
+            parser.allow_all = True
+    except requests.RequestException:
+        parser.allow_all = True
+    parser.modified()
+    with _registry_lock:
+        return _robots.setdefault(host, parser)
+
+
+def find_sitemaps(root_url: str) -> List[str]:
+    """Адреса sitemap из robots.txt сайта или, если их там нет, стандартный sitemap.xml."""
+    return get_robots(root_url).site_maps() or [f"{root_url.rstrip('/')}/sitemap.xml"]
+
+
+def wait_for_crawl_delay(url: str):
+    """
+    Если robots.txt хоста задает `Crawl-delay`, выдерживает паузу с момента предыдущего
+    "вежливого" запроса к этому хосту. Потоки, обращающиеся к одному хосту, выстраиваются в очередь.
+    """
+    delay = get_robots(url).crawl_delay('*')
+    if not delay:
+        return
+    host = _host_of(url)
+    with _registry_lock:
+        lock = _host_locks.setdefault(host, threading.Lock())
+    with lock:
+        wait = _last_request_at.get(host, 0) + float(delay) - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request_at[host] = time.monotonic()
+
+
+# --- 5. ЗАПРОСЫ ---
+
+def fetch(url: str, method: str = 'GET', session: Optional[requests.Session] = None, polite: bool = False,
+          use_cache: bool = True, **kwargs) -> requests.Response:
+    """
+    Единая точка для всех HTTP-запросов проекта.
+
+    :param session: Сессия для запроса. По умолчанию - общая сессия хоста (`get_session`).
+    :param polite: Соблюдать ли `Crawl-delay` из robots.txt хоста.
+    :param use_cache: Использовать ли дисковый кэш (только GET без `stream=True` и без своих
+                      условных заголовков, и только если задан HTTP_CACHE_DIR).
+    :param kwargs: Передаются в `requests` (timeout, headers, stream, allow_redirects, ...).
+    """
+    session = session or get_session(url)
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    stream = kwargs.get('stream', False)
+    headers = dict(kwargs.pop('headers', None) or {})
+    cacheable = (use_cache and HTTP_CACHE_DIR and method == 'GET' and not stream
+                 and 'If-None-Match' not in headers and 'If-Modified-Since' not in headers)
+
+    meta, body = _load_cached(url) if cacheable else (None, None)
+    if meta:
+        # Свежий ответ отдаем из кэша, не обращаясь к серверу.
+        if meta.get('max_age') is not None and time.time() - meta['stored_at'] < meta['max_age']:
+            _count(cache_hits=1)
+            return _response_from_cache(meta, body)
+        # Устаревший - перепроверяем условным запросом.
+        if meta['headers'].get('ETag'): headers['If-None-Match'] = meta['headers']['ETag']
+        if meta['headers'].get('Last-Modified'): headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+    if polite:
+        wait_for_crawl_delay(url)
+    response = session.request(method, url, headers=headers, **kwargs)
+    _count(requests=1)
+
+    if meta and response.status_code == 304:
+        # Сервер подтвердил, что копия в кэше актуальна.
+        response.close()
+        _count(revalidated=1)
+        meta['stored_at'], meta['max_age'] = time.time(), _freshness(response.headers)
+        try:
+            with open(_cache_paths(url)[0], 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+        except OSError:
+            pass
+        return _response_from_cache(meta, body)
+
+    if stream:
+        # Тело будет читаться позже кусками - считаем байты по мере чтения.
+        original_iter_content = response.iter_content
+
+        def counting_iter_content(*args, **kw):
+            counted = 0
+            for chunk in original_iter_content(*args, **kw):
+                counted = _count_wire_bytes(response, counted, len(chunk))
+                yield chunk
+        response.iter_content = counting_iter_content
+    else:
+        _count_wire_bytes(response, 0, len(response.content))
+        if cacheable:
+            _store_cached(url, response)
+    return response
+
+
+def _count_wire_bytes(response: requests.Response, counted: int, decoded: int) -> int:
+    """
+    Добавляет к счетчику байты, полученные по сети с прошлого вызова: сжатые (gzip) ответы считаются
+    по размеру до распаковки. `counted` - сколько байтов этого ответа уже учтено; возвращает новое значение.
+    Если соединение не сообщает число прочитанных байтов, учитывается размер распакованных данных.
+    """
+    tell = getattr(response.raw, 'tell', None)
+    try:
+        total = tell()
+    except Exception:
+        total = None
+    if not isinstance(total, int):
+        total = counted + decoded
+    _count(bytes=total - counted)
+    return total
+
+
+# --- 6. СТАТИСТИКА ---
+
+def get_http_stats() -> dict:
+    """Копия счетчиков: запросы к сети, скачанные по сети байты, ответы из кэша и успешные перепроверки (304)."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def print_http_stats():
+    stats = get_http_stats()
+    print(f"🌐 HTTP: {stats['requests']} запросов, {stats['bytes'] / 1024 / 1024:.1f} МБ скачано, "
+          f"{stats['cache_hits']} ответов из кэша, {stats['revalidated']} подтверждено сервером (304).")
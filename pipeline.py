@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+# --- Сквозной потоковый конвейер: sitemap -> анализ страниц -> поисковый индекс ---
+# Объединяет три задачи в один запуск. Вместо трех последовательных пакетных прогонов,
+# обменивающихся файлами, этапы работают одновременно и передают данные через очереди:
+#
+#   [обход sitemap (task3)] --ссылки--> [N потоков анализа страниц (task1)] --тексты--> [индексация (task2)]
+#
+# Очереди ограничены по размеру: если анализ не успевает, обход sitemap приостанавливается,
+# если не успевает индексация - приостанавливается анализ (backpressure). Поэтому память не растет,
+# а первые результаты поиска доступны уже через несколько минут после старта.
+#
+# Пример запуска:
+#   python pipeline.py --provider Selectel --max-pages 200 --workers 8 --query "создание сервера"
+
+# --- Импорт необходимых библиотек ---
+
+# `argparse` - для разбора параметров командной строки.
+import argparse
+# `os` - для создания папок и путей к файлам.
+import os
+# `queue`, `threading` - очереди и потоки, связывающие этапы конвейера.
+import queue
+import threading
+# `time` - для замера времени работы.
+import time
+from collections import defaultdict
+from itertools import islice
+
+# Функции трех задач. Импорт task3 также настраивает кодировку вывода в терминал.
+from task3_sitemap_finder import PROVIDER_ROOT_URLS, iter_provider_doc_urls
+from task1_downloader import OUTPUT_DIR as DOWNLOADED_PAGES_DIR, analyze_documentation_page, save_results
+from task2_search_simulation import add_document_to_index, save_index, search_and_rank
+import http_client
+
+
+# --- 1. НАСТРОЙКИ ---
+
+# Папка для итоговых файлов конвейера.
+ANALYSIS_RESULTS_DIR = "analysis_results"
+# Файлы с результатами анализа страниц и с индексом (таблицы - без расширения, см. exporter.py).
+PIPELINE_RESULTS_JSON = os.path.join(ANALYSIS_RESULTS_DIR, "pipeline_analysis_results.json")
+PIPELINE_RESULTS_TABLE = os.path.join(ANALYSIS_RESULTS_DIR, "pipeline_analysis_results")
+PIPELINE_INDEX_JSON = os.path.join(ANALYSIS_RESULTS_DIR, "pipeline_inverted_index.json")
+PIPELINE_INDEX_TABLE = os.path.join(ANALYSIS_RESULTS_DIR, "pipeline_inverted_index")
+# Поисковые запросы, результаты которых показываются по ходу обхода, если не заданы свои.
+DEFAULT_QUERIES = ["создание сервера", "api"]
+# Специальный объект-маркер "данных больше не будет" для очередей.
+_DONE = object()
+
+
+# --- 2. ЭТАПЫ КОНВЕЙЕРА ---
+
+def discover_urls(providers: list, url_queue: queue.Queue, workers: int, max_pages: int, stats: dict):
+    """
+    Этап 1 (task3): обходит sitemap'ы провайдеров и кладет ссылки документации в очередь.
+    `put` блокируется, когда очередь заполнена, - так обход подстраивается под скорость анализа.
+    По окончании кладет по маркеру завершения для каждого потока анализа.
+    """
+    urls = (url for provider in providers
+            for url, _ in iter_provider_doc_urls(provider, PROVIDER_ROOT_URLS[provider]))
+    try:
+        for url in (islice(urls, max_pages) if max_pages else urls):
+            url_queue.put(url)
+            stats['discovered'] += 1
+    except Exception as e:
+        print(f"❌ Ошибка на этапе обхода sitemap: {e}")
+    finally:
+        # Если обход остановлен по `max_pages`, закрываем генератор - вместе с ним закрывается
+        # и недочитанный потоковый ответ sitemap'а, иначе соединение осталось бы открытым.
+        urls.close()
+        for _ in range(workers):
+            url_queue.put(_DONE)
+
+
+def analyze_pages(url_queue: queue.Queue, text_queue: queue.Queue, results: list, link_cache: dict,
+                  check_links: bool, stats: dict):
+    """
+    Этап 2 (task1): забирает ссылки, скачивает и анализирует страницы, а их текст передает на индексацию.
+    Таких потоков несколько; каждый по завершении передает маркер дальше - даже если поток упал,
+    иначе этап индексации ждал бы его вечно.
+    """
+    try:
+        while True:
+            url = url_queue.get()
+            if url is _DONE:
+                return
+            try:
+                result = analyze_documentation_page(url, link_cache, check_links=check_links, keep_text=True, verbose=False)
+            except Exception as e:
+                # Ошибка на одной странице не должна останавливать поток: иначе очередь ссылок
+                # перестала бы разбираться и обход sitemap "повис" бы на `put`.
+                print(f"  ❌ Ошибка анализа {url}: {e}")
+                continue
+            text = result.pop("text", None)
+            results.append(result)  # `list.append` потокобезопасен.
+            # Счетчик общий для всех потоков анализа, поэтому увеличиваем его под блокировкой.
+            with stats['lock']:
+                stats['analyzed'] += 1
+                number = stats['analyzed']
+            status = "✅" if result["status"] == "Success" else f"❌ {result.get('error_message', '')}"
+            print(f"  [анализ {number}] {url} {status}")
+            if text:
+                text_queue.put((url, text))
+    finally:
+        text_queue.put(_DONE)
+
+
+def index_documents(text_queue: queue.Queue, index: defaultdict, workers: int, queries: list,
+                    report_every: int, stats: dict):
+    """
+    Этап 3 (task2): добавляет тексты страниц в обратный индекс по одному. Индекс меняет только этот поток,
+    поэтому и промежуточный поиск выполняется здесь же - каждые `report_every` документов.
+    """
+    finished_workers = 0
+    while finished_workers < workers:
+        item = text_queue.get()
+        if item is _DONE:
+            finished_workers += 1; continue
+        doc_id, text = item
+        # Поток индексации единственный: если он упадет, очередь текстов переполнится, и встанет весь
+        # конвейер. Поэтому ошибку на одном документе только печатаем и продолжаем.
+        try:
+            add_document_to_index(index, doc_id, text)
+            stats['indexed'] += 1
+            if report_every and stats['indexed'] % report_every == 0:
+                print_search_results(index, queries, stats)
+        except Exception as e:
+            print(f"  ❌ Ошибка индексации {doc_id}: {e}")
+
+
+def print_search_results(index: defaultdict, queries: list, stats: dict):
+    """Выполняет поисковые запросы по текущему состоянию индекса и печатает лучшие результаты."""
+    elapsed = time.perf_counter() - stats['started']
+    print(f"\n🔎 Поиск по {stats['indexed']} проиндексированным страницам ({elapsed:.0f} с от старта):")
+    for q in queries:
+        results = search_and_rank(q, index)
+        print(f"  > '{q}': найдено {len(results)}" + (f", лучшие: {results[:3]}" if results else ""))
+    print()
+
+
+# --- 3. ЗАПУСК ---
+
+def run_pipeline(providers: list, max_pages: int = 0, workers: int = 4, queue_size: int = 100,
+                 check_links: bool = False, queries: list = None, report_every: int = 10) -> defaultdict:
+    """
+    Запускает все три этапа одновременно и ждет их завершения. Возвращает построенный индекс.
+
+    :param max_pages: Максимум страниц для обработки (0 - без ограничения).
+    :param workers: Число потоков анализа страниц.
+    :param queue_size: Емкость каждой очереди между этапами.
+    :param check_links: Проверять ли ссылки на страницах на работоспособность (долго).
+    :param report_every: Как часто (в документах) показывать промежуточные результаты поиска.
+    """
+    queries = queries or DEFAULT_QUERIES
+    os.makedirs(DOWNLOADED_PAGES_DIR, exist_ok=True)
+    os.makedirs(ANALYSIS_RESULTS_DIR, exist_ok=True)
+
+    url_queue = queue.Queue(maxsize=queue_size)
+    text_queue = queue.Queue(maxsize=queue_size)
+    results, link_cache = [], {}
+    index = defaultdict(dict)
+    stats = {'discovered': 0, 'analyzed': 0, 'indexed': 0, 'started': time.perf_counter(), 'lock': threading.Lock()}
+
+    threads = [threading.Thread(target=discover_urls, args=(providers, url_queue, workers, max_pages, stats), daemon=True)]
+    threads += [threading.Thread(target=analyze_pages, args=(url_queue, text_queue, results, link_cache, check_links, stats),
+                                 daemon=True) for _ in range(workers)]
+    threads.append(threading.Thread(target=index_documents, args=(text_queue, index, workers, queries, report_every, stats),
+                                    daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.perf_counter() - stats['started']
+    print(f"\n📊 Найдено ссылок: {stats['discovered']}, проанализировано страниц: {stats['analyzed']}, "
+          f"проиндексировано: {stats['indexed']} за {elapsed:.1f} с.")
+    http_client.print_http_stats()
+    print_search_results(index, queries, stats)
+
+    print("💾 Сохраняю результаты...")
+    save_results(results, PIPELINE_RESULTS_JSON, PIPELINE_RESULTS_TABLE)
+    save_index(index, PIPELINE_INDEX_JSON, PIPELINE_INDEX_TABLE)
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сквозной конвейер: обход sitemap -> анализ страниц -> поисковый индекс.")
+    parser.add_argument("--provider", action="append", choices=list(PROVIDER_ROOT_URLS),
+                        help="Провайдер для обхода (можно указать несколько раз). По умолчанию - Selectel.")
+    parser.add_argument("--max-pages", type=int, default=100, help="Максимум страниц для обработки (0 - без ограничения).")
+    parser.add_argument("--workers", type=int, default=4, help="Число потоков анализа страниц.")
+    parser.add_argument("--queue-size", type=int, default=100, help="Емкость очередей между этапами.")
+    parser.add_argument("--check-links", action="store_true", help="Проверять ссылки на страницах на работоспособность (долго).")
+    parser.add_argument("--query", action="append", help="Поисковый запрос для промежуточных результатов (можно несколько).")
+    parser.add_argument("--report-every", type=int, default=10, help="Показывать результаты поиска каждые N документов.")
+    args = parser.parse_args()
+
+    print("🚀 Запускаю сквозной конвейер: sitemap -> анализ страниц -> индекс...\n")
+    run_pipeline(args.provider or ["Selectel"], args.max_pages, args.workers, args.queue_size,
+                 args.check_links, args.query, args.report_every)
+    print("🎉 Все задачи выполнены.")
@@ -10,7 +10,7 @@ import os
 import re
 # `json` - для работы с форматом данных JSON (для сохранения результатов).
 import json
-# `pandas` - мощная библиотека для анализа данных, используется для создания и сохранения Excel-файла.
+# `pandas` - мощная библиотека для анализа данных, используется для "расплющивания" результатов в таблицу.
 import pandas as pd
 # `BeautifulSoup` - главный инструмент для парсинга HTML-кода (извлечения данных из веб-страниц).
 # `Tag` - используется для безопасной проверки типов HTML-тегов.
@@ -19,17 +19,22 @@ from bs4 import BeautifulSoup, Tag
 from urllib.parse import urljoin, urlparse
 # `Counter` - удобный класс для подсчета одинаковых элементов (например, языков программирования).
 from collections import Counter
-# `sys`, `io` - для настройки стандартного вывода, чтобы избежать проблем с кодировкой в некоторых терминалах (особенно в Windows).
+# `sys` - для настройки стандартного вывода, чтобы избежать проблем с кодировкой в некоторых терминалах (особенно в Windows).
 import sys
-import io
 # `concurrent.futures` - библиотека для параллельного выполнения задач.
 # `ThreadPoolExecutor` идеально подходит для ускорения I/O-bound операций, таких как сетевые запросы.
 from concurrent.futures import ThreadPoolExecutor, as_completed
+# `export_rows` - общий для всех скриптов экспорт таблиц (Parquet, JSONL.gz, CSV, Excel по запросу).
+from exporter import export_rows
+# `http_client` - общий HTTP-клиент: пул соединений, повторы, robots.txt/Crawl-delay, кэш ответов и счетчики.
+import http_client
 
 # --- Настройка кодировки для вывода в терминал ---
 # Эта секция гарантирует, что русские символы будут корректно отображаться в консоли.
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+# `reconfigure` меняет кодировку существующего потока, а не создает новую обертку, поэтому
+# скрипты можно импортировать друг из друга (см. pipeline.py) без повторного "оборачивания" консоли.
+sys.stdout.reconfigure(encoding='utf-8')
+sys.stderr.reconfigure(encoding='utf-8')
 
 # --- 1. ГЛОБАЛЬНЫЕ НАСТРОЙКИ СКРИПТА ---
 
@@ -46,14 +51,10 @@ ANALYSIS_RESULTS_DIR = "analysis_results"
 # *** ИЗМЕНЕНИЕ: Скорректированы имена файлов ***
 # Полный путь к JSON-файлу. os.path.join используется для создания корректного пути независимо от ОС (Windows/Linux/macOS).
 JSON_RESULTS_FILE = os.path.join(ANALYSIS_RESULTS_DIR, "task1_analysis_results.json")
-# Полный путь к Excel-файлу.
-EXCEL_RESULTS_FILE = os.path.join(ANALYSIS_RESULTS_DIR, "task1_analysis_results.xlsx")
+# Путь к табличному файлу без расширения - расширение зависит от выбранного формата (см. exporter.py).
+TABLE_RESULTS_BASE = os.path.join(ANALYSIS_RESULTS_DIR, "task1_analysis_results")
 # Список ключевых технологий и инструментов, которые мы будем искать на страницах.
 TOOLS_KEYWORDS = ['API', 'Terraform', 'CLI', 'Ansible', 'Kubernetes', 'Docker', 'SDK']
-# Заголовки HTTP-запроса. `User-Agent` имитирует запрос из браузера, что повышает шансы на успешное скачивание.
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
 # Максимальное количество потоков для параллельной проверки ссылок.
 MAX_WORKERS_FOR_LINKS = 10
 
@@ -94,7 +95,9 @@ def print_report(result: dict):
         print(f"✅ Количество ссылок: {links['total_links']} (Внутренние: {links['internal_links']}, Внешние: {links['external_links']})")
 
         # Если есть битые ссылки, выводим предупреждение.
-        if links['broken_links'] > 0:
+        if links['broken_links'] is None:
+            print("ℹ️ Проверка ссылок на работоспособность пропущена.")
+        elif links['broken_links'] > 0:
             print(f"⚠️ Найдено битых ссылок: {links['broken_links']}")
         else:
             print(f"✅ Битые ссылки не обнаружены.")
@@ -112,7 +115,10 @@ def check_link(url: str) -> tuple[str, bool]:
     try:
         # HEAD-запрос эффективнее для проверки доступности, так как не загружает тело страницы.
         # allow_redirects=True позволяет корректно обрабатывать редиректы.
-        response = requests.head(url, headers=HEADERS, allow_redirects=True, timeout=5)
+        # Ссылки ведут на множество разных сайтов, поэтому все проверки идут через одну общую сессию
+        # с пулом соединений, а не через отдельную сессию на каждый хост.
+        response = http_client.fetch(url, method='HEAD', session=http_client.get_shared_session(),
+                                     allow_redirects=True, timeout=5)
         # Считаем ссылку "битой", если код ответа 400 или выше (ошибки клиента или сервера).
         if response.status_code >= 400:
             return url, True
@@ -122,7 +128,8 @@ def check_link(url: str) -> tuple[str, bool]:
         return url, True
 
 
-def analyze_documentation_page(url: str, link_status_cache: dict) -> dict:
+def analyze_documentation_page(url: str, link_status_cache: dict, check_links: bool = True,
+                               keep_text: bool = False, verbose: bool = True) -> dict:
     """
     Основная функция, которая выполняет полный анализ одной страницы
     и ВОЗВРАЩАЕТ результат в виде СЛОВАРЯ.
@@ -130,16 +137,20 @@ def analyze_documentation_page(url: str, link_status_cache: dict) -> dict:
     :param url: URL-адрес страницы для анализа.
     :param link_status_cache: Словарь для кэширования статусов ссылок (url -> is_broken),
                               чтобы не проверять одну и ту же ссылку много раз.
+    :param check_links: Проверять ли ссылки на работоспособность (самая долгая часть анализа).
+                        Если False, `broken_links` в результате будет None.
+    :param keep_text: Сохранить ли текст страницы в результате (ключ "text") - например, для индексации.
+    :param verbose: Печатать ли подробный отчет в терминал.
     """
     # Выводим заголовок, чтобы отделить анализ разных страниц в консоли.
-    print(f"\n{'='*20} Анализ страницы: {url} {'='*20}")
+    if verbose: print(f"\n{'='*20} Анализ страницы: {url} {'='*20}")
     # Создаем словарь для хранения результатов. Изначально статус "Failed".
     page_result = {"url": url, "status": "Failed"}
 
     # Блок try...except для обработки возможных ошибок (например, сайт недоступен).
     try:
-        # Отправляем GET-запрос на URL и скачиваем страницу.
-        response = requests.get(url, headers=HEADERS, timeout=15)
+        # Отправляем GET-запрос на URL и скачиваем страницу. `polite=True` - соблюдаем Crawl-delay из robots.txt сайта.
+        response = http_client.fetch(url, polite=True, timeout=15)
         # Явно указываем кодировку ответа, чтобы избежать проблем с русскими буквами.
         response.encoding = 'utf-8'
         # Если сервер вернул код ошибки (4xx или 5xx), эта строка вызовет исключение.
@@ -155,6 +166,8 @@ def analyze_documentation_page(url: str, link_status_cache: dict) -> dict:
         soup = BeautifulSoup(response.text, 'html.parser')
         # Извлекаем весь текст со страницы и приводим его к нижнему регистру для удобства поиска.
         page_text_content = soup.get_text().lower()
+        if keep_text:
+            page_result["text"] = page_text_content
 
         # --- АНАЛИЗ (сохраняем все в словарь `page_result`) ---
         page_result["status"] = "Success"  # Меняем статус на "успешно".
@@ -227,7 +240,8 @@ def analyze_documentation_page(url: str, link_status_cache: dict) -> dict:
 
         # 2. Фильтрация ссылок, которые уже были проверены ранее (использование кэша)
         # Оставляем только те ссылки, статуса которых еще нет в нашем глобальном кэше.
-        new_urls_to_check = [u for u in unique_urls_to_check if u not in link_status_cache]
+        # Если проверка ссылок отключена, проверять нечего.
+        new_urls_to_check = [u for u in unique_urls_to_check if u not in link_status_cache] if check_links else []
 
         # 3. Параллельная проверка новых ссылок
         # Создаем пул потоков для отправки запросов. `with` гарантирует, что потоки будут корректно завершены.
@@ -244,10 +258,11 @@ def analyze_documentation_page(url: str, link_status_cache: dict) -> dict:
             print("  -> Проверка ссылок завершена.")
 
         # 4. Подсчет битых ссылок на ТЕКУЩЕЙ странице, используя обновленный кэш
-        broken_links_count = 0
-        for u in unique_urls_to_check:
-            if link_status_cache.get(u, False): # Если ссылка в кэше и она 'битая'
-                broken_links_count += 1
+        broken_links_count = 0 if check_links else None
+        if check_links:
+            for u in unique_urls_to_check:
+                if link_status_cache.get(u, False): # Если ссылка в кэше и она 'битая'
+                    broken_links_count += 1
 
         # Сохраняем итоговую сводку по ссылкам в наш словарь результатов.
         page_result["links_summary"] = {
@@ -264,13 +279,61 @@ def analyze_documentation_page(url: str, link_status_cache: dict) -> dict:
         page_result["error_message"] = str(e)
 
     # --- ВЫВОД РЕЗУЛЬТАТОВ В ТЕРМИНАЛ ---
-    print_report(page_result)
-    print(f"{'='*25} Конец анализа {'='*25}")
+    if verbose:
+        print_report(page_result)
+        print(f"{'='*25} Конец анализа {'='*25}")
 
     # Возвращаем словарь с результатами для последующей обработки.
     return page_result
 
 
+def save_results(all_results: list, json_path: str = JSON_RESULTS_FILE, table_base: str = TABLE_RESULTS_BASE):
+    """
+    Сохраняет результаты анализа страниц в JSON-файл и в таблицу (формат выбирается в exporter.py).
+    """
+    # Сохраняем итоговый список в JSON-файл.
+    with open(json_path, 'w', encoding='utf-8') as f:
+        # `indent=2` делает файл красиво отформатированным и читаемым.
+        # `ensure_ascii=False` позволяет корректно сохранять русские буквы.
+        json.dump(all_results, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Результаты анализа сохранены в JSON файл: {json_path}")
+
+    # Создаем таблицу DataFrame из списка результатов. `json_normalize` отлично "расплющивает" вложенные словари.
+    df = pd.json_normalize(all_results, sep='_')
+    # Переименовываем некоторые столбцы для большей наглядности в таблице.
+    df.rename(columns={
+        'links_summary_total_links': 'Total Links',
+        'links_summary_internal_links': 'Internal Links',
+        'links_summary_external_links': 'External Links',
+        'links_summary_broken_links': 'Broken Links'
+    }, inplace=True)
+    # Типы колонок определяем по всей таблице сразу, а не по первой порции строк при записи:
+    # например, колонка `code_languages_*` может появиться только у страниц в конце списка.
+    column_types = {column: get_column_type(df[column]) for column in df.columns}
+    # Пустые ячейки (NaN) заменяем на None, чтобы все форматы записали их как "нет значения".
+    df = df.astype(object).where(pd.notna(df), None)
+    # Сохраняем таблицу в выбранных форматах.
+    print("\n💾 Сохраняю таблицу с результатами анализа...")
+    export_rows(table_base, list(df.columns), df.itertuples(index=False, name=None), column_types=column_types)
+
+
+def get_column_type(column: pd.Series) -> str:
+    """
+    Тип колонки для табличных форматов со схемой (см. `export_rows`): 'int64', 'float64', 'bool' или 'string'.
+    Счетчики, у которых на части страниц нет значения, pandas хранит как дробные числа - если все
+    значения целые, колонка остается целочисленной.
+    """
+    kind = pd.api.types.infer_dtype(column, skipna=True)
+    if kind == 'boolean':
+        return 'bool'
+    if kind == 'integer':
+        return 'int64'
+    if kind in ('floating', 'mixed-integer-float'):
+        values = column.dropna()
+        return 'int64' if (values == values.round()).all() else 'float64'
+    return 'string'
+
+
 # --- ОСНОВНОЙ БЛОК ИСПОЛНЕНИЯ СКРИПТА ---
 # `if __name__ == "__main__":` означает, что этот код выполнится только тогда,
 # когда мы запускаем этот файл напрямую, а не импортируем его в другой скрипт.
@@ -298,26 +361,9 @@ if __name__ == "__main__":
         all_results.append(result)
 
     print(f"\n📊 Всего проверено и закэшировано {len(master_link_cache)} уникальных ссылок.")
+    http_client.print_http_stats()
 
     # --- СОХРАНЕНИЕ РЕЗУЛЬТАТОВ В ФАЙЛЫ ---
-    # Сохраняем итоговый список в JSON-файл.
-    with open(JSON_RESULTS_FILE, 'w', encoding='utf-8') as f:
-        # `indent=2` делает файл красиво отформатированным и читаемым.
-        # `ensure_ascii=False` позволяет корректно сохранять русские буквы.
-        json.dump(all_results, f, indent=2, ensure_ascii=False)
-    print(f"\n✅ Результаты анализа сохранены в JSON файл: {JSON_RESULTS_FILE}")
-
-    # Создаем таблицу DataFrame из списка результатов. `json_normalize` отлично "расплющивает" вложенные словари.
-    df = pd.json_normalize(all_results, sep='_')
-    # Переименовываем некоторые столбцы для большей наглядности в Excel.
-    df.rename(columns={
-        'links_summary_total_links': 'Total Links',
-        'links_summary_internal_links': 'Internal Links',
-        'links_summary_external_links': 'External Links',
-        'links_summary_broken_links': 'Broken Links'
-    }, inplace=True)
-    # Сохраняем таблицу в Excel-файл. `index=False` убирает лишний столбец с индексами.
-    df.to_excel(EXCEL_RESULTS_FILE, index=False, engine='openpyxl')
-    print(f"✅ Результаты анализа сохранены в Excel файл: {EXCEL_RESULTS_FILE}")
+    save_results(all_results)
 
     print("\n🎉 Все задачи выполнены.")
\ No newline at end of file
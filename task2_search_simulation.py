@@ -11,15 +11,14 @@ import re
 from collections import defaultdict, Counter
 # `time` - для измерения производительности и демонстрации скорости поиска.
 import time
-# `sys`, `io` - для настройки терминала, чтобы он корректно отображал русские символы.
+# `sys` - для настройки терминала, чтобы он корректно отображал русские символы.
 import sys
-import io
 # `os` - для работы с файловой системой (создание папок, формирование путей к файлам).
 import os
-# `pandas` - для создания таблиц и сохранения результатов в формате Excel.
-import pandas as pd
 # `json` - для сохранения результатов в формате JSON.
 import json
+# `export_rows` - общий для всех скриптов экспорт таблиц (Parquet, JSONL.gz, CSV, Excel по запросу).
+from exporter import export_rows
 
 # *** РЕКОМЕНДАЦИЯ №1 и №2: Лемматизация ***
 # Для качественной обработки русского языка нам понадобится библиотека pymorphy2.
@@ -33,8 +32,10 @@ except ImportError:
 
 
 # --- Настройка кодировки для вывода в терминал ---
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+# `reconfigure` меняет кодировку существующего потока, а не создает новую обертку, поэтому
+# скрипты можно импортировать друг из друга (см. pipeline.py) без повторного "оборачивания" консоли.
+sys.stdout.reconfigure(encoding='utf-8')
+sys.stderr.reconfigure(encoding='utf-8')
 
 
 # --- 1. ИСХОДНЫЕ ДАННЫЕ И ГЛОБАЛЬНЫЕ НАСТРОЙКИ ---
@@ -74,7 +75,8 @@ STOP_WORDS = {
 ANALYSIS_RESULTS_DIR = "analysis_results"
 # *** ИЗМЕНЕНИЕ: Скорректированы имена файлов ***
 JSON_RESULTS_FILE = os.path.join(ANALYSIS_RESULTS_DIR, "task2_inverted_index.json")
-EXCEL_RESULTS_FILE = os.path.join(ANALYSIS_RESULTS_DIR, "task2_inverted_index.xlsx")
+# Путь к табличному файлу без расширения - расширение зависит от выбранного формата (см. exporter.py).
+TABLE_RESULTS_BASE = os.path.join(ANALYSIS_RESULTS_DIR, "task2_inverted_index")
 
 # Инициализируем морфологический анализатор. Делаем это один раз глобально,
 # так как создание этого объекта - ресурсоемкая операция.
@@ -103,6 +105,22 @@ def tokenize_and_lemmatize(text: str) -> list[str]:
     return lemmas
 
 
+def add_document_to_index(inverted_index: defaultdict[str, dict[str, int]], doc_id: str, text: str):
+    """
+    Добавляет один документ в уже существующий "обогащенный" индекс.
+    Позволяет наполнять индекс постепенно, по мере поступления документов (см. pipeline.py).
+    """
+    # Получаем список лемм для документа.
+    lemmas = tokenize_and_lemmatize(text)
+    # С помощью Counter мгновенно считаем, сколько раз каждая лемма встретилась в тексте.
+    # Например: ['создание', 'сервер', 'api'] -> {'создание': 1, 'сервер': 1, 'api': 1}
+    lemma_counts = Counter(lemmas)
+
+    for lemma, count in lemma_counts.items():
+        # Заполняем наш индекс: для этой леммы, в этом документе, частота равна count.
+        inverted_index[lemma][doc_id] = count
+
+
 def build_rich_inverted_index(docs: dict[str, str]) -> defaultdict[str, dict[str, int]]:
     """
     Создает "Обогащенный обратный индекс".
@@ -115,16 +133,7 @@ def build_rich_inverted_index(docs: dict[str, str]) -> defaultdict[str, dict[str
     # Внутренний словарь: ключ - ID документа, значение - частота леммы в нем.
     inverted_index = defaultdict(dict)
     for doc_id, text in docs.items():
-        # Получаем список лемм для документа.
-        lemmas = tokenize_and_lemmatize(text)
-        # С помощью Counter мгновенно считаем, сколько раз каждая лемма встретилась в тексте.
-        # Например: ['создание', 'сервер', 'api'] -> {'создание': 1, 'сервер': 1, 'api': 1}
-        lemma_counts = Counter(lemmas)
-        
-        for lemma, count in lemma_counts.items():
-            # Заполняем наш индекс: для этой леммы, в этом документе, частота равна count.
-            inverted_index[lemma][doc_id] = count
-            
+        add_document_to_index(inverted_index, doc_id, text)
     return inverted_index
 
 
@@ -142,11 +151,12 @@ def search_and_rank(query: str, index: defaultdict[str, dict[str, int]]) -> list
     # --- Шаг 1: Поиск документов (пересечение) ---
     # Находим документы, в которых есть ПЕРВАЯ лемма из запроса.
     # `.keys()` возвращает ID всех документов, где есть лемма.
-    try:
-        result_doc_ids = set(index[query_lemmas[0]].keys())
-    except KeyError:
+    # Проверяем через `in`, а не через `index[...]`: у defaultdict обращение к отсутствующей
+    # лемме молча добавило бы ее в индекс.
+    if query_lemmas[0] not in index:
         # Если даже первой леммы нет в индексе, то результатов точно нет.
         return []
+    result_doc_ids = set(index[query_lemmas[0]].keys())
 
     # Последовательно "отсекаем" документы, в которых нет ОСТАЛЬНЫХ лемм.
     # `intersection_update` - очень быстрая операция над множествами.
@@ -179,6 +189,25 @@ def search_and_rank(query: str, index: defaultdict[str, dict[str, int]]) -> list
     return sorted_docs
 
 
+def save_index(index: dict[str, dict[str, int]], json_path: str = JSON_RESULTS_FILE, table_base: str = TABLE_RESULTS_BASE):
+    """
+    Сохраняет индекс в JSON-файл и в таблицу (формат выбирается в exporter.py).
+    """
+    os.makedirs(os.path.dirname(json_path) or '.', exist_ok=True)
+
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    print(f"✅ Индекс сохранен в формате JSON: {json_path}")
+
+    # Одна строка таблицы на каждую пару (лемма, документ). Строки генерируются "на лету"
+    # и записываются порциями, поэтому даже большой индекс не дублируется в памяти.
+    postings = ((lemma, doc_id, frequency)
+                for lemma, doc_freqs in index.items()
+                for doc_id, frequency in doc_freqs.items())
+    export_rows(table_base, ['lemma', 'document_id', 'frequency'], postings,
+                column_types={'lemma': 'string', 'document_id': 'string', 'frequency': 'int64'})
+
+
 # --- 3. ОСНОВНОЙ БЛОК ДЕМОНСТРАЦИИ ---
 if __name__ == "__main__":
     print("--- Симуляция поиска с лемматизацией и ранжированием ---")
@@ -198,19 +227,7 @@ if __name__ == "__main__":
     # --- ЭТАП 2: ЭКСПОРТ ИНДЕКСА В ФАЙЛЫ (ОПЦИОНАЛЬНО) ---
     print("\n[ЭТАП 2] Экспорт индекса в файлы для анализа...")
 
-    if not os.path.exists(ANALYSIS_RESULTS_DIR):
-        os.makedirs(ANALYSIS_RESULTS_DIR)
-
-    with open(JSON_RESULTS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(search_index, f, indent=2, ensure_ascii=False)
-    print(f"✅ Индекс сохранен в формате JSON: {JSON_RESULTS_FILE}")
-
-    csv_data = []
-    for lemma, doc_freqs in search_index.items():
-        for doc_id, frequency in doc_freqs.items():
-            csv_data.append({'lemma': lemma, 'document_id': doc_id, 'frequency': frequency})
-    pd.DataFrame(csv_data).to_excel(EXCEL_RESULTS_FILE, index=False)
-    print(f"✅ Индекс сохранен в формате Excel: {EXCEL_RESULTS_FILE}")
+    save_index(search_index)
 
     # --- ЭТАП 3: ПОИСК С РАНЖИРОВАНИЕМ ---
     print("\n[ЭТАП 3] Выполнение поисковых запросов по индексу...\n")
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+# --- Бенчмарк парсинга sitemap для task3 ---
+# Измеряет пропускную способность `get_all_urls_from_sitemap_requests` без обращения к реальным сайтам:
+# дерево sitemap-файлов генерируется "на лету" и отдается локальным HTTP-сервером в отдельном процессе.
+# Результат (URL/с, sitemap/с, время, пиковая память) служит точкой отсчета при любых
+# изменениях в сетевой части или парсере task3.
+#
+# Пример запуска:
+#   python task3_benchmark.py --depth 2 --fanout 10 --urls-per-file 5000 --gzip --latency 20
+
+# --- Импорт необходимых библиотек ---
+
+# `argparse` - для разбора параметров командной строки.
+import argparse
+# `gzip` - для сжатия генерируемых файлов (сервер отдает .xml.gz, как настоящие сайты).
+import gzip
+# `json` - для вывода результата в машиночитаемом виде.
+import json
+# `multiprocessing` - сервер работает в отдельном процессе, чтобы его память и загрузка процессора
+# не попадали в замер.
+import multiprocessing
+# `threading` - внутри серверного процесса сервер работает в фоновом потоке, а основной ждет команду остановки.
+import threading
+# `os` - для доступа к os.devnull (подавление подробного вывода task3).
+import os
+# `sys` - для определения платформы (единицы измерения пиковой памяти различаются).
+import sys
+# `time` - для замеров времени и имитации задержки сети.
+import time
+# `contextlib.redirect_stdout` - чтобы построчный вывод task3 не искажал замер.
+from contextlib import redirect_stdout
+# `http.server` - встроенный HTTP-сервер Python, достаточный для локального стенда.
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# `resource` есть только на Unix. На Windows пиковую память просто не показываем.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import http_client
+# Импорт task3 также настраивает кодировку вывода в терминал.
+from task3_sitemap_finder import get_all_urls_from_sitemap_requests
+
+
+# --- 1. НАСТРОЙКИ ГЕНЕРАТОРА ---
+
+# Варианты пространства имен XML, которые встречаются в реальных sitemap-файлах.
+NAMESPACE_VARIANTS = {
+    'standard': 'http://www.sitemaps.org/schemas/sitemap/0.9',
+    'https': 'https://www.sitemaps.org/schemas/sitemap/0.9',
+    'google': 'http://www.google.com/schemas/sitemap/0.84',
+    'none': None,
+}
+# Адрес, под которым "живут" страницы внутри сгенерированных sitemap-файлов.
+PAGE_BASE_URL = "https://bench.example/docs"
+
+
+# --- 2. ГЕНЕРАЦИЯ ДЕРЕВА SITEMAP ---
+
+class SitemapTree:
+    """
+    Описание сгенерированного дерева sitemap: `depth` уровней индексных файлов, у каждого `fanout`
+    вложенных файлов, в каждом конечном файле `urls_per_file` ссылок. При depth=0 корень сам
+    является конечным файлом. При `use_gzip` сжатыми (.xml.gz) отдаются все файлы дерева, включая
+    корневой и индексные. Файлы не хранятся в памяти, а строятся по адресу при каждом запросе.
+    """
+
+    def __init__(self, depth: int, fanout: int, urls_per_file: int, use_gzip: bool, namespace: str):
+        self.depth = depth
+        self.fanout = fanout
+        self.urls_per_file = urls_per_file
+        self.use_gzip = use_gzip
+        self.namespace = namespace
+        self.base_url = ""  # Заполняется после запуска сервера.
+
+    @property
+    def expected_sitemaps(self) -> int:
+        return sum(self.fanout ** level for level in range(self.depth + 1))
+
+    @property
+    def expected_urls(self) -> int:
+        return self.fanout ** self.depth * self.urls_per_file
+
+    @property
+    def root_url(self) -> str:
+        return f"{self.base_url}/sitemap{self._extension}"
+
+    @property
+    def _extension(self) -> str:
+        return ".xml.gz" if self.use_gzip else ".xml"
+
+    def _namespace_for(self, node: str) -> str:
+        """Пространство имен для файла. В режиме 'mixed' варианты чередуются от файла к файлу."""
+        if self.namespace != 'mixed':
+            return self.namespace
+        variants = list(NAMESPACE_VARIANTS)
+        return variants[sum(map(ord, node)) % len(variants)]
+
+    def _child_url(self, node: str, index: int) -> str:
+        child = f"{node}-{index}" if node else str(index)
+        return f"{self.base_url}/sm/{child}{self._extension}"
+
+    def render(self, path: str) -> bytes:
+        """Строит содержимое файла по его адресу. Возвращает b'' для неизвестных адресов."""
+        if path == f"/sitemap{self._extension}":
+            node = ""
+        elif path.startswith("/sm/"):
+            node = path[len("/sm/"):].split('.', 1)[0]
+        else:
+            return b''
+        level = node.count('-') + 1 if node else 0
+        ns = NAMESPACE_VARIANTS[self._namespace_for(node)]
+        xmlns = f' xmlns="{ns}"' if ns else ''
+        if level < self.depth:
+            items = (f"<sitemap><loc>{self._child_url(node, i)}</loc></sitemap>" for i in range(self.fanout))
+            body = f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex{xmlns}>{"".join(items)}</sitemapindex>'
+        else:
+            page_dir = node.replace('-', '/') or "root"
+            items = (f"<url><loc>{PAGE_BASE_URL}/{page_dir}/page-{i}/</loc><lastmod>2024-01-01</lastmod></url>"
+                     for i in range(self.urls_per_file))
+            body = f'<?xml version="1.0" encoding="UTF-8"?><urlset{xmlns}>{"".join(items)}</urlset>'
+        data = body.encode('utf-8')
+        return gzip.compress(data) if path.endswith('.gz') else data
+
+
+# --- 3. ЛОКАЛЬНЫЙ HTTP-СЕРВЕР ---
+
+def _serve(tree: SitemapTree, latency: float, control):
+    """
+    Тело серверного процесса: поднимает сервер на свободном порту, сообщает порт родителю
+    через канал `control` и обслуживает запросы, пока родитель не пришлет команду остановки
+    (или не закроет канал).
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            # Имитируем задержку сети / времени ответа сервера.
+            if latency: time.sleep(latency)
+            data = tree.render(self.path)
+            if not data:
+                self.send_error(404); return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-gzip" if self.path.endswith('.gz') else "application/xml")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass  # Не засоряем консоль журналом запросов.
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    tree.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    control.send(server.server_address[1])
+    try:
+        control.recv()
+    except EOFError:
+        pass
+    server.shutdown(); server.server_close()
+
+
+def start_server(tree: SitemapTree, latency: float):
+    """
+    Запускает сервер в отдельном процессе и прописывает его адрес в дерево. Так пиковая память
+    (RSS) и время замера относятся только к клиенту - генерация файлов и сжатие gzip на сервере
+    не занимают память процесса-клиента и не конкурируют с ним за GIL.
+    Возвращает (процесс, канал управления) - их нужно передать в `stop_server`.
+    """
+    control, child_control = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(tree, latency, child_control), daemon=True)
+    process.start()
+    if not control.poll(30):
+        process.terminate()
+        raise RuntimeError("Сервер бенчмарка не запустился за 30 секунд.")
+    tree.base_url = f"http://127.0.0.1:{control.recv()}"
+    return process, control
+
+
+def stop_server(process, control):
+    """Просит серверный процесс завершиться и ждет его. Если он не отвечает - останавливает принудительно."""
+    try:
+        control.send('stop')
+    except OSError:
+        pass
+    control.close()
+    process.join(5)
+    if process.is_alive():
+        process.terminate(); process.join()
+
+
+def peak_rss_mb() -> float:
+    """Пиковая память процесса-клиента (RSS) в МБ или -1, если на этой платформе ее не узнать."""
+    if resource is None:
+        return -1.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На macOS значение в байтах, на Linux - в килобайтах.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# --- 4. ЗАПУСК ЗАМЕРА ---
+
+def run_benchmark(tree: SitemapTree, latency: float, verbose: bool = False) -> dict:
+    """Поднимает сервер, обходит дерево через `get_all_urls_from_sitemap_requests` и возвращает метрики."""
+    server = start_server(tree, latency)
+    try:
+        # Новая сессия на каждый замер, чтобы соединения из предыдущего прогона не влияли на результат.
+        session = http_client.new_session()
+        visited = set()
+        start = time.perf_counter()
+        if verbose:
+            urls = get_all_urls_from_sitemap_requests(session, tree.root_url, visited)
+        else:
+            with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+                urls = get_all_urls_from_sitemap_requests(session, tree.root_url, visited)
+        wall = time.perf_counter() - start
+    finally:
+        stop_server(*server)
+    return {
+        'urls': len(urls),
+        'sitemaps': len(visited),
+        'expected_urls': tree.expected_urls,
+        'expected_sitemaps': tree.expected_sitemaps,
+        'wall_time_s': round(wall, 3),
+        'urls_per_s': round(len(urls) / wall, 1) if wall else 0.0,
+        'sitemaps_per_s': round(len(visited) / wall, 2) if wall else 0.0,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк парсинга sitemap (task3) на локальном сгенерированном дереве.")
+    parser.add_argument("--depth", type=int, default=1, help="Число уровней индексных sitemap-файлов (0 - один конечный файл).")
+    parser.add_argument("--fanout", type=int, default=10, help="Число вложенных файлов у каждого индекса.")
+    parser.add_argument("--urls-per-file", type=int, default=5000, help="Число ссылок в каждом конечном файле.")
+    parser.add_argument("--gzip", action="store_true", help="Отдавать все sitemap-файлы, включая индексные, сжатыми (.xml.gz).")
+    parser.add_argument("--namespace", choices=[*NAMESPACE_VARIANTS, 'mixed'], default='standard',
+                        help="Вариант XML namespace (mixed - чередовать варианты).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа сервера в миллисекундах.")
+    parser.add_argument("--verbose", action="store_true", help="Показывать построчный вывод task3.")
+    parser.add_argument("--json", action="store_true", help="Вывести результат одной строкой JSON.")
+    args = parser.parse_args()
+
+    tree = SitemapTree(args.depth, args.fanout, args.urls_per_file, args.gzip, args.namespace)
+    print(f"🚀 Бенчмарк: глубина {args.depth}, ветвление {args.fanout}, {args.urls_per_file} ссылок в файле, "
+          f"gzip={'да' if args.gzip else 'нет'}, namespace={args.namespace}, задержка {args.latency} мс")
+    result = run_benchmark(tree, args.latency / 1000, args.verbose)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+    else:
+        print(f"  - Время: {result['wall_time_s']} с")
+        print(f"  - Ссылок: {result['urls']} ({result['urls_per_s']} URL/с)")
+        print(f"  - Sitemap-файлов: {result['sitemaps']} ({result['sitemaps_per_s']} sitemap/с)")
+        rss = result['peak_rss_mb']
+        print(f"  - Пиковая память (RSS): {f'{rss} МБ' if rss >= 0 else 'недоступно на этой платформе'}")
+    if (result['urls'], result['sitemaps']) != (result['expected_urls'], result['expected_sitemaps']):
+        print(f"⚠️ Ожидалось {result['expected_urls']} ссылок и {result['expected_sitemaps']} sitemap-файлов - "
+              "часть дерева не была обработана.")
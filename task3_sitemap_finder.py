@@ -4,24 +4,33 @@
 
 # Стандартные библиотеки Python
 import xml.etree.ElementTree as ET # Встроенная библиотека для разбора (парсинга) XML-файлов.
-import gzip                      # Для распаковки .gz архивов, так как sitemap-файлы могут быть сжаты.
-from typing import List, Set, Optional # Для указания типов данных (List, Set). Делает код более читаемым.
+import re                        # Для разбиения имени sitemap-файла на слова.
+from urllib.parse import urlparse # Для разбора префикса документации на хост и путь.
+import zlib                      # Для потоковой распаковки .gz архивов "на лету", так как sitemap-файлы могут быть сжаты.
+from typing import Callable, Iterable, Iterator, List, Set, Optional, Tuple, Union # Для указания типов данных (List, Set). Делает код более читаемым.
+from itertools import islice     # Для того, чтобы взять первые несколько элементов из генератора.
 import sys                       # Для работы с системными параметрами.
-import io                        # Для работы с потоками данных.
 import os                        # Для работы с операционной системой, в нашем случае — для создания папки.
 import json                      # Для работы с форматом JSON.
+import time                      # Для проверки срока действия сохраненной сессии браузера.
 
 # Сторонние библиотеки (требуют установки через pip)
 import requests                  # Для отправки обычных HTTP-запросов (как в браузере).
-import pandas as pd              # Мощная библиотека для анализа данных. Мы используем её для удобного создания Excel-файла.
 import undetected_chromedriver as uc # Специальная, модифицированная версия Selenium, которая умеет обходить продвинутые защиты от ботов.
 from bs4 import BeautifulSoup    # Очень удобная библиотека для извлечения данных из "грязного" HTML-кода.
 
+# Модули этого проекта
+from url_store import CompactUrlStore # Компактное хранилище для миллионов ссылок (вместо set/dict из строк).
+from exporter import export_rows      # Общий экспорт таблиц (Parquet, JSONL.gz, CSV, Excel по запросу).
+import http_client                    # Общий HTTP-клиент: заголовки, пул соединений, повторы, robots.txt, счетчики.
+
 # --- БЛОК 2: НАСТРОЙКА ОКРУЖЕНИЯ ---
 
 # Эта часть нужна, чтобы в консоли Windows и других систем корректно отображались русские буквы.
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+# `reconfigure` меняет кодировку существующего потока, а не создает новую обертку, поэтому
+# скрипты можно импортировать друг из друга (см. pipeline.py) без повторного "оборачивания" консоли.
+sys.stdout.reconfigure(encoding='utf-8')
+sys.stderr.reconfigure(encoding='utf-8')
 
 # --- БЛОК 3: ГЛОБАЛЬНЫЕ НАСТРОЙКИ И КОНСТАНТЫ ---
 
@@ -29,63 +38,365 @@ sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 PROVIDER_ROOT_URLS = {"Selectel": "https://docs.selectel.ru/", "Yandex Cloud": "https://cloud.yandex.ru/", "VK Cloud": "https://cloud.vk.com/"}
 # Префиксы, по которым мы будем определять, относится ли ссылка к документации.
 DOC_PREFIXES = {"Selectel": "https://docs.selectel.ru/", "Yandex Cloud": "https://yandex.cloud/ru/docs/", "VK Cloud": "https://cloud.vk.com/docs/"}
-# Техническая настройка для правильного поиска тегов в XML-файлах стандарта sitemap.
-XML_NAMESPACE = {'sitemap': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-# Заголовки, которые наш скрипт будет отправлять. `User-Agent` говорит сайту, что мы — обычный браузер Chrome, а не подозрительный скрипт.
-HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36'}
+# Размер порции (в байтах), которыми мы читаем тело ответа. Файл никогда не загружается в память целиком.
+STREAM_CHUNK_SIZE = 64 * 1024
 # Имя папки, куда будут сохраняться итоговые файлы.
 OUTPUT_DIR = "analysis_results"
+# Файл с состоянием между запусками: ETag/Last-Modified и `<lastmod>` каждого sitemap, а также
+# итоговые ссылки по провайдерам. Нужен для инкрементальной синхронизации.
+SYNC_STATE_FILE = os.path.join(OUTPUT_DIR, 'task3_sitemap_state.json')
+# Слова в имени вложенного sitemap-файла, по которым видно, что документации в нем нет (блог, новости и т.п.).
+# Такие файлы мы даже не скачиваем. Сравниваются целые слова имени (разделители '-', '_', '.'), поэтому
+# 'sitemap-express-servers.xml' не отбрасывается из-за 'press'.
+NON_DOC_SITEMAP_KEYWORDS = ('blog', 'news', 'press', 'events', 'careers', 'promo', 'marketing')
+# Сколько первых ссылок файла мы просматриваем, прежде чем решить, что ссылок документации в нем нет,
+# и прекратить чтение. Эвристика может потерять ссылки документации из "смешанных" файлов, где они
+# идут после остальных, поэтому по умолчанию выключена (`None` - файлы всегда читаются целиком).
+DOC_PROBE_URLS: Optional[int] = None
+# Индексный sitemap Яндекса, который пользователь открывает в браузере.
+YANDEX_SITEMAP_INDEX_URL = "https://yandex.cloud/sitemap_index.xml"
+# Файл, в котором сохраняются cookies и XML индекса после ручного прохождения защиты Яндекса.
+YANDEX_SESSION_FILE = os.path.join(OUTPUT_DIR, 'task3_yandex_session.json')
+# Сколько секунд сохраненная сессия считается действительной. По истечении срока снова нужен браузер.
+YANDEX_SESSION_TTL = 12 * 60 * 60
 
 
 # --- БЛОК 4: ОСНОВНЫЕ ФУНКЦИИ ---
 
-def get_all_urls_from_sitemap_requests(session, sitemap_url: str, visited: Set[str]) -> List[str]:
+def _local_name(tag: str) -> str:
+    """
+    Возвращает имя тега без пространства имен: '{http://www.sitemaps.org/schemas/sitemap/0.9}loc' -> 'loc'.
+    Благодаря этому мы одинаково понимаем sitemap с любым вариантом namespace (http/https, старые
+    схемы Google) и вовсе без него.
+    """
+    return tag.rsplit('}', 1)[-1]
+
+def _drain_sitemap_events(parser: ET.XMLPullParser, state: dict) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    Забирает из парсера накопившиеся события и выдает найденные записи.
+    `state` хранит состояние разбора между вызовами: стек имен открытых тегов, корневой элемент
+    и поля текущей записи (`loc`, `lastmod`).
+    """
+    path = state['path']
+    for event, elem in parser.read_events():
+        name = _local_name(elem.tag)
+        if event == 'start':
+            if state['root'] is None: state['root'] = elem
+            path.append(name)
+            continue
+        path.pop()
+        # Нас интересуют только `<loc>` и `<lastmod>`, которые лежат прямо внутри `<sitemap>` или `<url>`.
+        # Так мы не путаем их, например, с `<image:loc>` из расширений sitemap.
+        if name in ('loc', 'lastmod') and path and path[-1] in ('sitemap', 'url'):
+            state[name] = elem.text.strip() if elem.text else None
+        elif name in ('sitemap', 'url') and len(path) == 1:
+            if state['loc']: yield name, state['loc'], state['lastmod']
+            state['loc'] = state['lastmod'] = None
+            # Запись полностью обработана - очищаем дерево, чтобы память не росла с размером файла.
+            state['root'].clear()
+
+def _gunzip_chunk(decompressor, chunk: bytes):
+    """
+    Распаковывает очередной кусок .gz. Файл может состоять из нескольких склеенных gzip-архивов
+    ("членов") - когда один заканчивается, остаток куска распаковываем новым распаковщиком.
+    Возвращает (распакованные байты, распаковщик для следующих кусков).
+    """
+    parts = [decompressor.decompress(chunk)]
+    while decompressor.eof and decompressor.unused_data:
+        rest = decompressor.unused_data
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parts.append(decompressor.decompress(rest))
+    return b''.join(parts), decompressor
+
+def iter_sitemap_entries(chunks: Iterable[bytes]) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    Потоковый разбор sitemap-файла. Принимает тело ответа кусками, при необходимости распаковывает
+    gzip "на лету" и выдает записи (тип, ссылка, lastmod) по одной, где тип - 'sitemap' (ссылка на
+    вложенный sitemap) или 'url' (конечная страница), а lastmod - дата изменения или None.
+    Пиковое потребление памяти не зависит от размера файла.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    state = {'path': [], 'root': None, 'loc': None, 'lastmod': None}
+    decompressor = None
+    head = b''  # Начало файла, пока мы не увидели достаточно байтов, чтобы распознать gzip.
+    for chunk in chunks:
+        if not chunk: continue
+        if head is not None:
+            head += chunk
+            if len(head) < 2: continue
+            # Проверяем 'магические' байты .gz - если они есть, включаем потоковую распаковку.
+            if head.startswith(b'\x1f\x8b'): decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            chunk, head = head, None
+        if decompressor: chunk, decompressor = _gunzip_chunk(decompressor, chunk)
+        parser.feed(chunk)
+        yield from _drain_sitemap_events(parser, state)
+    # Файл короче двух байтов - отдаем парсеру то, что есть.
+    if head: parser.feed(head)
+    if decompressor: parser.feed(decompressor.flush())
+    parser.close()
+    yield from _drain_sitemap_events(parser, state)
+
+def sitemap_may_contain_docs(sitemap_url: str, url_prefix: Optional[str]) -> bool:
+    """
+    Решает по адресу (`loc`) вложенного sitemap, стоит ли его вообще скачивать.
+    Без префикса документации нужны все файлы. Если префикс - весь сайт (например, 'https://docs.selectel.ru/'),
+    документацией является любая ссылка, и по имени файла ничего отбрасывать нельзя. Иначе имя файла
+    со словом 'doc...' пропускаем всегда, а файлы блога, новостей и т.п. (см. `NON_DOC_SITEMAP_KEYWORDS`) - отбрасываем.
+    """
+    if not url_prefix or urlparse(url_prefix).path in ('', '/'): return True
+    filename = sitemap_url.rstrip('/').rsplit('/', 1)[-1].lower()
+    words = set(re.split(r'[-_.]', filename))
+    if any(word.startswith('doc') for word in words): return True
+    return words.isdisjoint(NON_DOC_SITEMAP_KEYWORDS)
+
+def _replay_cached_sitemap(session, entry: dict, visited: Union[Set[str], CompactUrlStore], sync: dict,
+                           url_prefix: Optional[str] = None) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Выдает ссылки неизменившегося sitemap из сохраненного состояния и продолжает обход его
+    вложенных sitemap'ов (каждый из них тоже может оказаться неизменившимся).
+    """
+    yield from entry['urls'].items()
+    for loc, child_lastmod in entry['children'].items():
+        yield from iter_urls_from_sitemap(session, loc, visited, child_lastmod, sync, url_prefix)
+
+def iter_urls_from_sitemap(session, sitemap_url: str, visited: Union[Set[str], CompactUrlStore], lastmod: Optional[str] = None,
+                           sync: Optional[dict] = None, url_prefix: Optional[str] = None) -> Iterator[Tuple[str, Optional[str]]]:
     """
     Эта функция — наша 'рабочая лошадка'. Она скачивает и парсит sitemap-файлы.
     Используется для "простых" сайтов (Selectel, VK Cloud) и для вложенных файлов Яндекса,
     когда у нас уже есть "ключи" (cookies) в сессии.
     Функция рекурсивная: если она находит sitemap, который ссылается на другие sitemap'ы,
     она вызывает саму себя для каждой новой ссылки.
+    Ответ читается потоком, а пары (ссылка, lastmod) выдаются по одной (генератор), поэтому даже
+    sitemap на 50 000 URL не загружается в память целиком.
+
+    :param lastmod: `<lastmod>` этого файла из родительского индекса (если есть).
+    :param sync: Состояние инкрементальной синхронизации `{'previous': {...}, 'current': {...}}`
+                 (url sitemap'а -> сохраненные данные о нем). Если передано, неизменившиеся файлы
+                 не скачиваются повторно, а их ссылки берутся из прошлого запуска. Если файл не удалось
+                 прочитать полностью и прошлых данных о нем нет, устанавливается `sync['incomplete'] = True`.
+    :param url_prefix: Префикс документации. Если передан, наружу выдаются только ссылки с этим
+                       префиксом, а файлы, в которых их заведомо нет, пропускаются (см. `sitemap_may_contain_docs`
+                       и `DOC_PROBE_URLS`).
     """
     # 1. Проверяем, не были ли мы уже на этой странице, чтобы избежать бесконечного цикла.
-    if sitemap_url in visited: return []
-    print(f"    - (Requests) Обрабатываю: {sitemap_url}"); visited.add(sitemap_url)
+    if sitemap_url in visited: return
+    visited.add(sitemap_url)
+    if not sitemap_may_contain_docs(sitemap_url, url_prefix):
+        print(f"    - (Фильтр) Не относится к документации, пропускаю: {sitemap_url}"); return
+    previous = sync['previous'].get(sitemap_url) if sync else None
+    # Состояние, сохраненное с другим префиксом, содержит другой набор ссылок - его использовать нельзя.
+    if previous and previous.get('prefix') != url_prefix: previous = None
 
-    # 2. Делаем GET-запрос с помощью сессии `requests`.
+    # 2. Если индекс сообщает ту же дату изменения, что и в прошлый раз, файл даже не скачиваем.
+    if previous and lastmod and previous.get('lastmod') == lastmod:
+        print(f"    - (Кэш) Не изменился по lastmod, пропускаю: {sitemap_url}")
+        sync['current'][sitemap_url] = previous
+        yield from _replay_cached_sitemap(session, previous, visited, sync, url_prefix); return
+    print(f"    - (Requests) Обрабатываю: {sitemap_url}")
+
+    # 3. Делаем потоковый GET-запрос через общий HTTP-клиент (`stream=True` - тело не скачивается сразу,
+    # `polite=True` - соблюдаем Crawl-delay из robots.txt).
+    # Если файл уже скачивался, делаем "условный" запрос: сервер ответит 304, если он не изменился.
+    headers = {}
+    if previous and previous.get('etag'): headers['If-None-Match'] = previous['etag']
+    if previous and previous.get('last_modified'): headers['If-Modified-Since'] = previous['last_modified']
     try:
-        r = session.get(sitemap_url, timeout=20); r.raise_for_status(); content = r.content
+        r = http_client.fetch(sitemap_url, session=session, polite=True, timeout=20, stream=True, headers=headers); r.raise_for_status()
     except Exception as e:
-        print(f"      ❌ Ошибка сети: {e}"); return []
-
-    # 3. Если ответа нет, выходим.
-    if not content:
-        print(f"      ❌ Пустой ответ от сервера для {sitemap_url}"); return []
-        
-    # 4. Проверяем, не сжат ли файл (не начинается ли он с 'магических' байтов .gz), и если да — распаковываем.
-    if content.startswith(b'\x1f\x8b'): content = gzip.decompress(content)
+        print(f"      ❌ Ошибка сети: {e}")
+        # Временная ошибка не должна выглядеть как "все ссылки удалены" - используем прошлые данные.
+        if previous:
+            print("      - Использую данные прошлого запуска.")
+            sync['current'][sitemap_url] = previous
+            yield from _replay_cached_sitemap(session, previous, visited, sync, url_prefix)
+        elif sync is not None:
+            # Прошлых данных нет - помечаем результат как неполный, чтобы не считать недостающие ссылки удаленными.
+            sync['incomplete'] = True
+        return
+    if r.status_code == 304 and previous:
+        r.close(); print("      - 304 Not Modified, использую данные прошлого запуска.")
+        entry = dict(previous, lastmod=lastmod or previous.get('lastmod'))
+        sync['current'][sitemap_url] = entry
+        yield from _replay_cached_sitemap(session, entry, visited, sync, url_prefix); return
 
-    # 5. Парсим XML и извлекаем ссылки.
+    # 4. Читаем ответ кусками, распаковываем и парсим XML "на лету".
+    # Ссылки на вложенные sitemap'ы откладываем до конца файла, чтобы не держать
+    # открытыми сразу несколько соединений при рекурсии. Индексные файлы небольшие.
+    entry = {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified'),
+             'lastmod': lastmod, 'prefix': url_prefix, 'urls': CompactUrlStore(), 'children': {}}
+    scanned, matched, complete, abandoned = 0, 0, False, False
     try:
-        root = ET.fromstring(content); urls = []
-        # Ищем теги `<sitemap>`, которые указывают на другие sitemap-файлы.
-        if root.findall('sitemap:sitemap', XML_NAMESPACE):
-            for node in root.findall('sitemap:sitemap', XML_NAMESPACE):
-                if (loc := node.find('sitemap:loc', XML_NAMESPACE)) is not None:
-                    # Если находим — вызываем себя же (рекурсия).
-                    urls.extend(get_all_urls_from_sitemap_requests(session, loc.text, visited))
-        # Если это конечный sitemap, ищем теги `<url>` и извлекаем из них ссылки.
-        else:
-            for node in root.findall('sitemap:url', XML_NAMESPACE):
-                if (loc := node.find('sitemap:loc', XML_NAMESPACE)) is not None:
-                    urls.append(loc.text)
-        return urls
+        with r:
+            for kind, loc, loc_lastmod in iter_sitemap_entries(r.iter_content(chunk_size=STREAM_CHUNK_SIZE)):
+                if kind == 'sitemap':
+                    entry['children'][loc] = loc_lastmod
+                    continue
+                scanned += 1
+                # Ссылки не из документации отбрасываем сразу, не накапливая их.
+                if url_prefix and not loc.startswith(url_prefix):
+                    # Если среди первых ссылок файла нет ни одной нужной - документации здесь нет,
+                    # дочитывать (и скачивать) остаток файла незачем.
+                    if not matched and DOC_PROBE_URLS and scanned >= DOC_PROBE_URLS:
+                        print(f"      - В первых {scanned} ссылках нет документации, пропускаю остаток файла.")
+                        abandoned = True
+                        break
+                    continue
+                matched += 1
+                # Ссылки запоминаем, только если ведем состояние - иначе память не расходуем.
+                if sync: entry['urls'].add(loc, loc_lastmod)
+                yield loc, loc_lastmod
+        complete = True
     except ET.ParseError as e:
-        print(f"      ❌ Ошибка парсинга XML: {e}"); return []
+        print(f"      ❌ Ошибка парсинга XML: {e}")
+    except (requests.RequestException, zlib.error) as e:
+        print(f"      ❌ Ошибка при чтении ответа: {e}")
+
+    # Сохраняем состояние только для полностью разобранных файлов. Если чтение оборвалось,
+    # недочитанная часть берется из прошлого запуска (как и при ошибке сети до начала ответа).
+    # Файл, брошенный по `DOC_PROBE_URLS`, не сохраняем: иначе его пустой список ссылок
+    # "закрепился" бы в состоянии до следующего изменения файла.
+    if abandoned:
+        pass
+    elif complete:
+        if sync: sync['current'][sitemap_url] = entry
+    elif previous:
+        print("      - Использую данные прошлого запуска для непрочитанной части файла.")
+        sync['current'][sitemap_url] = previous
+        yield from ((url, url_lastmod) for url, url_lastmod in previous['urls'].items() if url not in entry['urls'])
+        entry['children'] = {**previous['children'], **entry['children']}
+    elif sync is not None:
+        sync['incomplete'] = True
+
+    # 5. Если это индексный файл - обходим вложенные sitemap'ы (рекурсия).
+    for loc, child_lastmod in entry['children'].items():
+        yield from iter_urls_from_sitemap(session, loc, visited, child_lastmod, sync, url_prefix)
+
+def get_all_urls_from_sitemap_requests(session, sitemap_url: str, visited: Set[str]) -> List[str]:
+    """
+    Совместимая обертка над `iter_urls_from_sitemap`: собирает все ссылки в список.
+    """
+    return [url for url, _ in iter_urls_from_sitemap(session, sitemap_url, visited)]
 
-def process_yandex_cloud_manual() -> List[str]:
+def load_sync_state(path: str = SYNC_STATE_FILE) -> dict:
     """
-    Эта функция — наше финальное решение для Яндекса. Она реализует гибридный подход 'Кража сессии',
-    когда человек помогает пройти самую сложную первоначальную защиту, а дальше скрипт работает автоматически.
+    Загружает состояние прошлого запуска. Если файла нет или он поврежден, начинаем с чистого листа.
+    Структура: {"sitemaps": {url sitemap'а: {...}}, "urls": {провайдер: {ссылка: lastmod}}}
+    Списки ссылок сразу перекладываются в компактные хранилища (`CompactUrlStore`), а прочитанные
+    словари освобождаются - иначе все известные ссылки держались бы в памяти дважды обычными строками.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        sitemaps, urls = state.get('sitemaps', {}), state.get('urls', {})
+        for entry in sitemaps.values():
+            entry['urls'] = _to_url_store(entry.get('urls', {}))
+            entry.setdefault('children', {})
+        for provider in urls:
+            urls[provider] = _to_url_store(urls[provider])
+        return {'sitemaps': sitemaps, 'urls': urls}
+    except (OSError, ValueError, AttributeError):
+        return {'sitemaps': {}, 'urls': {}}
+
+def _to_url_store(urls: dict) -> CompactUrlStore:
+    """Перекладывает словарь (ссылка -> lastmod) в компактное хранилище, опустошая словарь по ходу."""
+    store = CompactUrlStore()
+    while urls:
+        store.add(*urls.popitem())
+    return store
+
+def save_sync_state(state: dict, path: str = SYNC_STATE_FILE):
+    """Сохраняет состояние для следующего запуска."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        # Компактные хранилища ссылок превращаются в обычные словари (ссылка -> lastmod) только при записи.
+        json.dump(state, f, ensure_ascii=False, default=lambda store: dict(store.items()))
+
+def compute_url_delta(previous: dict, current: dict) -> dict:
+    """
+    Сравнивает ссылки прошлого и текущего запуска (ссылка -> lastmod) и возвращает изменения:
+    добавленные, удаленные и измененные (у которых поменялся `<lastmod>`).
+    """
+    return {
+        'added': sorted(url for url in current if url not in previous),
+        'removed': sorted(url for url in previous if url not in current),
+        'modified': sorted(url for url, lastmod in current.items()
+                           if url in previous and lastmod and lastmod != previous[url]),
+    }
+
+def _looks_like_sitemap(chunks: Iterable[bytes]) -> bool:
+    """Проверяет, что ответ - настоящий sitemap (а не, например, страница с капчей): достаточно одной записи."""
+    try:
+        return next(iter_sitemap_entries(chunks), None) is not None
+    except (ET.ParseError, zlib.error):
+        return False
+
+def build_cookie_session(cookies: List[dict]) -> requests.Session:
+    """Создает сессию `requests` со стандартными заголовками и cookies, полученными из браузера."""
+    # Создаем отдельную сессию общего HTTP-клиента (стандартные заголовки, пул соединений, повторы),
+    # а не общую сессию хоста - cookies Яндекса не должны попадать в другие запросы.
+    session = http_client.new_session()
+    # Передаем украденные cookies в нашу сессию. Теперь эта сессия для сайта Яндекса будет выглядеть как "своя".
+    for cookie in cookies:
+        session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'])
+    return session
+
+def load_browser_session(path: str = YANDEX_SESSION_FILE) -> Optional[dict]:
+    """
+    Загружает сохраненную сессию браузера: {"cookies": [...], "content": XML индекса, "expires_at": время}.
+    Возвращает None, если файла нет, он поврежден или срок его действия истек.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Поврежденный или чужой файл (не словарь, без числового срока действия) считаем отсутствующим.
+    if not isinstance(saved, dict) or not isinstance(saved.get('expires_at'), (int, float)):
+        return None
+    if saved['expires_at'] <= time.time() or not saved.get('cookies'):
+        return None
+    return saved
+
+def save_browser_session(cookies: List[dict], content: str, path: str = YANDEX_SESSION_FILE,
+                         expires_at: Optional[float] = None):
+    """Сохраняет cookies и рабочее XML-содержимое индекса на диск, чтобы следующие запуски обошлись без браузера."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'cookies': cookies, 'content': content,
+                   'expires_at': expires_at or time.time() + YANDEX_SESSION_TTL}, f, ensure_ascii=False)
+
+def validate_browser_session(session, index_url: str, cached_content: Optional[str] = None) -> Optional[str]:
+    """
+    Проверяет, пускает ли сайт сессию с сохраненными cookies. Возвращает рабочее XML-содержимое индекса или None.
+    Сначала пробуем скачать сам индекс (так получаем свежую версию). Если индекс защищен сильнее,
+    проверяем первый вложенный sitemap из сохраненного индекса - если он открывается, сохраненный индекс годится.
+    """
+    try:
+        # Ответ зависит от cookies, поэтому дисковый кэш здесь не используем.
+        r = http_client.fetch(index_url, session=session, use_cache=False, timeout=20); r.raise_for_status()
+        if _looks_like_sitemap([r.content]): return r.content.decode('utf-8', errors='replace')
+    except Exception as e:
+        print(f"      - Индекс по сохраненной сессии недоступен: {e}")
+    if not cached_content: return None
+    try:
+        entries = iter_sitemap_entries([cached_content.strip().encode('utf-8')])
+        first_child = next((loc for kind, loc, _ in entries if kind == 'sitemap'), None)
+    except ET.ParseError:
+        return None
+    if not first_child: return None
+    try:
+        with http_client.fetch(first_child, session=session, timeout=20, stream=True) as r:
+            r.raise_for_status()
+            if _looks_like_sitemap(r.iter_content(chunk_size=STREAM_CHUNK_SIZE)): return cached_content
+    except Exception as e:
+        print(f"      - Вложенный sitemap по сохраненной сессии недоступен: {e}")
+    return None
+
+def steal_browser_session(index_url: str = YANDEX_SITEMAP_INDEX_URL) -> Optional[Tuple[List[dict], str]]:
+    """
+    Ручной этап 'Кражи сессии': запускает видимый браузер, ждет, пока человек пройдет защиту,
+    и возвращает (cookies, XML-содержимое индекса) или None, если извлечь XML не удалось.
     """
     print("  - Обнаружена защита высшего уровня. Использую 'Кражу сессии'...")
     driver: Optional[uc.Chrome] = None
@@ -103,7 +414,7 @@ def process_yandex_cloud_manual() -> List[str]:
         print("--- ТРЕБУЕТСЯ ВАШЕ ДЕЙСТВИЕ ---")
         print("1. Сейчас откроется окно браузера Chrome.")
         print("2. Вручную откройте в нем страницу:")
-        print("   https://yandex.cloud/sitemap_index.xml")
+        print(f"   {index_url}")
         print("3. Дождитесь, пока на экране появится содержимое XML-файла.")
         print("\n   ВАЖНО: НЕ ЗАКРЫВАЙТЕ ОКНО БРАУЗЕРА САМОСТОЯТЕЛЬНО!\n")
         input("4. После этого вернитесь в эту консоль и нажмите Enter...")
@@ -155,33 +466,92 @@ def process_yandex_cloud_manual() -> List[str]:
         print("      💡 Возможная причина: Версия браузера Chrome обновилась, и внутренний механизм отображения XML изменился.")
         print("      💡 Что проверить: Откройте XML-файл в Chrome вручную, нажмите 'Просмотреть код' и посмотрите, как устроен HTML.")
         print(f"      - Техническая деталь ошибки: {e}")
-        return [] # Возвращаем пустой список, чтобы скрипт мог продолжить работу с другими провайдерами.
+        return None # Возвращаем None, чтобы скрипт мог продолжить работу с другими провайдерами.
     finally:
         # Крайне важный блок! Он гарантирует, что браузер будет закрыт, даже если произошла ошибка.
         if driver:
             driver.quit()
             print("    - Браузер Selenium закрыт. Он нам больше не нужен.")
 
+    return cookies, content
+
+def process_yandex_cloud_manual(sync: Optional[dict] = None, url_prefix: Optional[str] = None,
+                                index_url: str = YANDEX_SITEMAP_INDEX_URL,
+                                session_file: str = YANDEX_SESSION_FILE,
+                                steal: Callable[[str], Optional[Tuple[List[dict], str]]] = steal_browser_session
+                                ) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Эта функция — наше финальное решение для Яндекса. Она реализует гибридный подход 'Кража сессии',
+    когда человек помогает пройти самую сложную первоначальную защиту, а дальше скрипт работает автоматически.
+    Украденная сессия сохраняется на диск (см. `YANDEX_SESSION_TTL`), поэтому следующие запуски сначала
+    пробуют ее и открывают браузер, только если сайт ее больше не принимает.
+    Выдает пары (ссылка, lastmod) по одной. `sync` и `url_prefix` - см. `iter_urls_from_sitemap`.
+
+    :param steal: Функция ручного этапа (по умолчанию `steal_browser_session`): принимает адрес индекса
+                  и возвращает (cookies, XML индекса) или None. В тестах подменяется, чтобы не запускать браузер.
+    """
+    # --- ЭТАП 0: ПОПЫТКА ИСПОЛЬЗОВАТЬ СОХРАНЕННУЮ СЕССИЮ ---
+    content: Optional[str] = None
+    saved = load_browser_session(session_file)
+    if saved:
+        print("  - Найдена сохраненная сессия браузера, проверяю ее...")
+        session = build_cookie_session(saved['cookies'])
+        content = validate_browser_session(session, index_url, saved.get('content'))
+        if content:
+            print("    - ✅ Сохраненная сессия работает, браузер не нужен.")
+            # Обновляем сохраненный индекс, срок действия сессии при этом не продлеваем.
+            try:
+                save_browser_session(saved['cookies'], content, session_file, saved['expires_at'])
+            except OSError as e:
+                print(f"    - ❌ Не удалось обновить сохраненную сессию: {e}")
+        else:
+            print("    - Сохраненная сессия больше не принимается сайтом.")
+
+    # --- ЭТАПЫ 1-2: РУЧНОЙ ПРОРЫВ ЧЕРЕЗ БРАУЗЕР (ЕСЛИ СОХРАНЕННАЯ СЕССИЯ НЕ ПОДОШЛА) ---
+    if not content:
+        stolen = steal(index_url)
+        if not stolen: return
+        cookies, content = stolen
+        session = build_cookie_session(cookies)
+        try:
+            save_browser_session(cookies, content, session_file)
+            print(f"    - Сессия сохранена в {session_file} и будет использована при следующих запусках.")
+        except OSError as e:
+            print(f"    - ❌ Не удалось сохранить сессию: {e}")
+
     # --- ЭТАП 3: АВТОМАТИЧЕСКАЯ ОБРАБОТКА (С ИСПОЛЬЗОВАНИЕМ ПОЛУЧЕННЫХ ДАННЫХ) ---
-    # Создаем быструю и стабильную сессию `requests`.
-    session = requests.Session()
-    # "Вооружаем" ее стандартными заголовками.
-    session.headers.update(HEADERS)
-    # Передаем украденные cookies в нашу сессию. Теперь эта сессия для сайта Яндекса будет выглядеть как "своя".
-    for cookie in cookies:
-        session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'])
     print("    - Сессия Requests аутентифицирована. Начинаю быструю обработку.")
     
-    # Парсим уже чистый XML и дальше используем нашу быструю функцию `get_all_urls_from_sitemap_requests`
-    # с уже "заряженной" аутентифицированной сессией.
-    root = ET.fromstring(content)
-    total_urls = []
-    visited_sitemaps = set()
-    sitemap_nodes = root.findall('sitemap:sitemap', XML_NAMESPACE)
-    for node in sitemap_nodes:
-        if (loc := node.find('sitemap:loc', XML_NAMESPACE)) is not None:
-            total_urls.extend(get_all_urls_from_sitemap_requests(session, loc.text, visited_sitemaps))
-    return total_urls
+    # Парсим уже чистый XML тем же потоковым парсером и дальше используем нашу быструю функцию
+    # `iter_urls_from_sitemap` с уже "заряженной" аутентифицированной сессией.
+    visited_sitemaps = CompactUrlStore()
+    try:
+        for kind, loc, lastmod in iter_sitemap_entries([content.strip().encode('utf-8')]):
+            if kind == 'sitemap':
+                yield from iter_urls_from_sitemap(session, loc, visited_sitemaps, lastmod, sync, url_prefix)
+            elif not url_prefix or loc.startswith(url_prefix):
+                yield loc, lastmod
+    except ET.ParseError as e:
+        print(f"      ❌ Ошибка парсинга XML: {e}")
+
+def iter_provider_doc_urls(provider: str, root_url: str, sync: Optional[dict] = None) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Генератор-конвейер для одного провайдера: находит его sitemap'ы, обходит их и выдает
+    по одной только ссылки документации (с префиксом из `DOC_PREFIXES`) вместе с их lastmod.
+    Ссылки, не относящиеся к документации, отбрасываются прямо во время чтения и нигде не накапливаются.
+    """
+    doc_prefix = DOC_PREFIXES[provider]
+    # Если это Яндекс, вызываем нашу специальную 'гибридную' функцию.
+    if provider == "Yandex Cloud":
+        yield from process_yandex_cloud_manual(sync, doc_prefix); return
+    # Для всех остальных — используем стандартный, простой метод.
+    print("  - Использую стандартный режим Requests.")
+    session = http_client.get_session(root_url)
+    visited_sitemaps = CompactUrlStore()
+    # Адреса sitemap-файлов берем из robots.txt сайта (или стандартный sitemap.xml, если их там нет).
+    # robots.txt скачивается один раз и кэшируется в `http_client` - из него же берется Crawl-delay.
+    for entry in http_client.find_sitemaps(root_url):
+        yield from iter_urls_from_sitemap(session, entry, visited_sitemaps, sync=sync, url_prefix=doc_prefix)
 
 # --- БЛОК 5: ОСНОВНОЙ КОД СКРИПТА ---
 
@@ -191,54 +561,58 @@ if __name__ == "__main__":
     print("🚀 Запускаю скрипт для поиска и парсинга sitemap-файлов...\n")
 
     # Создаем пустые структуры, в которые будем собирать все найденные ссылки для последующего экспорта.
-    all_data_for_excel = [] # Список словарей для Excel.
-    all_data_for_json = {}  # Словарь, где ключ - провайдер, значение - список ссылок.
+    # Ссылки хранятся в компактном виде (`CompactUrlStore`) и не дублируются для разных форматов экспорта.
+    all_data_for_json = {}  # Словарь, где ключ - провайдер, значение - хранилище его ссылок.
+    all_deltas = {}         # Изменения по сравнению с прошлым запуском: провайдер -> {added, removed, modified}.
+
+    # Загружаем состояние прошлого запуска для инкрементальной синхронизации.
+    sync_state = load_sync_state()
+    sync = {'previous': sync_state['sitemaps'], 'current': {}}
 
     # Проходим по каждому провайдеру из наших настроек.
     for provider, root_url in PROVIDER_ROOT_URLS.items():
         print(f"--- Обрабатываю провайдера: {provider} ---")
         
-        # Если это Яндекс, вызываем нашу специальную 'гибридную' функцию.
-        if provider == "Yandex Cloud":
-            total_urls = process_yandex_cloud_manual()
-        # Для всех остальных — используем стандартный, простой метод.
-        else:
-            print("  - Использую стандартный режим Requests.")
-            session = requests.Session(); session.headers.update(HEADERS)
-            try:
-                # Пытаемся найти sitemap в файле robots.txt - это правильный способ.
-                r = requests.get(f"{root_url.rstrip('/')}/robots.txt", timeout=10)
-                sitemap_entries = [line.split(': ')[1] for line in r.text.splitlines() if line.lower().startswith('sitemap:')]
-                # Если в robots.txt ничего нет, пробуем стандартный sitemap.xml.
-                if not sitemap_entries: sitemap_entries.append(f"{root_url.rstrip('/')}/sitemap.xml")
-            except Exception:
-                # Если и это не сработало, просто используем стандартное имя.
-                sitemap_entries = [f"{root_url.rstrip('/')}/sitemap.xml"]
-                
-            total_urls = []
-            visited_sitemaps = set()
-            for entry in sitemap_entries:
-                total_urls.extend(get_all_urls_from_sitemap_requests(session, entry, visited_sitemaps))
-        
-        # Фильтруем все найденные ссылки, оставляя только те, что относятся к документации.
+        # Собираем ссылки документации прямо из потока: фильтрация по префиксу происходит во время
+        # чтения sitemap'ов, а компактное хранилище (ссылка -> lastmod) сразу убирает дубликаты
+        # и отдает ссылки уже отсортированными.
         doc_prefix = DOC_PREFIXES[provider]
-        doc_urls = sorted(list(set([url for url in total_urls if url.startswith(doc_prefix)])))
+        doc_urls = CompactUrlStore()
+        sync['incomplete'] = False
+        doc_urls.update(iter_provider_doc_urls(provider, root_url, sync))
+
+        # Сравниваем с прошлым запуском. Если ничего не собрали (например, защита Яндекса не пройдена)
+        # или часть sitemap'ов не удалось прочитать, оставляем прошлое состояние, чтобы не посчитать
+        # недостающие ссылки "удаленными".
+        if sync['incomplete']:
+            print("  - ⚠️ Часть sitemap-файлов прочитать не удалось: список ссылок неполный, изменения не считаю.")
+        elif doc_urls:
+            delta = compute_url_delta(sync_state['urls'].get(provider, {}), doc_urls)
+            all_deltas[provider] = delta
+            sync_state['urls'][provider] = doc_urls
+            print(f"  - Изменения: +{len(delta['added'])} новых, -{len(delta['removed'])} удаленных, ~{len(delta['modified'])} измененных.")
         
         # Наполняем наши структуры данных для будущего экспорта.
         all_data_for_json[provider] = doc_urls
-        for url in doc_urls:
-            all_data_for_excel.append({'provider': provider, 'url': url})
 
         # Выводим итоговую статистику по каждому провайдеру.
         print(f"\n✅ Найдено всего {len(doc_urls)} уникальных страниц в разделе документации '{doc_prefix}'.")
+        print(f"  - Память под ссылки: {doc_urls.memory_bytes() / 1024:.1f} КБ.")
         if doc_urls:
-            print("  Примеры ссылок:"); [print(f"    - {url}") for url in doc_urls[:3]]
+            print("  Примеры ссылок:"); [print(f"    - {url}") for url in islice(doc_urls, 3)]
         print("-" * 25)
 
     # --- БЛОК 6: ЭКСПОРТ РЕЗУЛЬТАТОВ ---
+
+    # Сохраняем состояние для следующего запуска (только sitemap'ы, которые встретились в этот раз).
+    sync_state['sitemaps'] = sync['current']
+    try:
+        save_sync_state(sync_state)
+    except Exception as e:
+        print(f"  - ❌ Не удалось сохранить состояние синхронизации: {e}")
     
     # Проверяем, есть ли что сохранять.
-    if all_data_for_excel:
+    if any(all_data_for_json.values()):
         print("\n💾 Сохраняю результаты в файлы...")
         
         # Создаем папку для результатов, если она еще не существует.
@@ -251,22 +625,27 @@ if __name__ == "__main__":
             with open(json_path, 'w', encoding='utf-8') as f:
                 # `indent=4` делает файл красивым и читаемым.
                 # `ensure_ascii=False` позволяет корректно сохранять русские буквы.
-                json.dump(all_data_for_json, f, indent=4, ensure_ascii=False)
+                # `default=list` превращает хранилище ссылок в отсортированный список прямо во время записи.
+                json.dump(all_data_for_json, f, indent=4, ensure_ascii=False, default=list)
             print(f"  - ✅ JSON-файл успешно сохранен: {json_path}")
         except Exception as e:
             print(f"  - ❌ Не удалось сохранить JSON-файл: {e}")
 
-        # 2. Сохраняем в Excel.
-        excel_path = os.path.join(OUTPUT_DIR, 'task3_documentation_urls.xlsx')
+        # 2. Сохраняем изменения по сравнению с прошлым запуском - дальнейший анализ может обрабатывать только их.
+        delta_path = os.path.join(OUTPUT_DIR, 'task3_documentation_urls_delta.json')
         try:
-            # Создаем из нашего списка словарей DataFrame (таблицу pandas).
-            df = pd.DataFrame(all_data_for_excel)
-            # Одной командой `to_excel` сохраняем его в файл.
-            # `index=False` убирает ненужную колонку с индексами строк.
-            df.to_excel(excel_path, index=False)
-            print(f"  - ✅ Excel-файл успешно сохранен: {excel_path}")
+            with open(delta_path, 'w', encoding='utf-8') as f:
+                json.dump(all_deltas, f, indent=4, ensure_ascii=False)
+            print(f"  - ✅ JSON-файл с изменениями успешно сохранен: {delta_path}")
         except Exception as e:
-            print(f"  - ❌ Не удалось сохранить Excel-файл: {e}")
+            print(f"  - ❌ Не удалось сохранить JSON-файл с изменениями: {e}")
+
+        # 3. Сохраняем таблицу (провайдер, ссылка) в выбранных форматах.
+        # Строки берутся прямо из хранилищ ссылок и записываются порциями, без промежуточной таблицы в памяти.
+        rows = ((provider, url) for provider, doc_urls in all_data_for_json.items() for url in doc_urls)
+        export_rows(os.path.join(OUTPUT_DIR, 'task3_documentation_urls'), ['provider', 'url'], rows,
+                    column_types={'provider': 'string', 'url': 'string'})
 
     # Финальное сообщение.
+    http_client.print_http_stats()
     print("\n🎉 Все задачи выполнены.")
\ No newline at end of file
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+# Скрипты проекта лежат в корне репозитория - добавляем его в путь импорта для тестов.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# --- Тесты восстановления экспорта после ошибок записи (exporter.py) ---
+# Когда единственный выбранный формат не удается дописать, уже записанные строки должны попасть
+# в запасной jsonl.gz (или остаться в частично сохраненном файле), а отчет - показывать, сколько
+# строк реально записано в каждый файл.
+#
+# Запуск:
+#   python -m pytest tests
+
+import gzip
+import json
+
+import pytest
+
+from exporter import export_rows
+
+
+def read_jsonl(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_parquet_keeps_big_integers_exact_when_floats_arrive(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    report = export_rows(str(tmp_path / 'table'), ['x'], [(2 ** 60 + 1,), (2 ** 60 + 1,), (0.5,)],
+                         ['parquet'], chunk_size=2)
+
+    assert [entry['format'] for entry in report] == ['parquet']
+    # float64 исказил бы 2**60+1, поэтому колонка расширена сразу до строк.
+    assert pq.read_table(report[0]['path']).column('x').to_pylist() == [str(2 ** 60 + 1)] * 2 + ['0.5']
+
+
+def test_csv_rows_are_moved_to_fallback(tmp_path, monkeypatch):
+    import exporter
+    write_chunk = exporter._CsvWriter.write_chunk
+
+    def fail_on_second_chunk(self, rows):
+        if self._rows:
+            self._writer.writerow(rows[0])  # Часть порции успела попасть в файл.
+            raise OSError('нет места на диске')
+        write_chunk(self, rows)
+
+    monkeypatch.setattr(exporter._CsvWriter, 'write_chunk', fail_on_second_chunk)
+    rows = [(1, 'a', 1.5), (2, '', None), (3, 'c', 2.5)]
+    report = export_rows(str(tmp_path / 'table'), ['n', 's', 'f'], rows, ['csv'], chunk_size=2,
+                         column_types={'n': 'int64', 's': 'string', 'f': 'float64'})
+
+    assert [(entry['format'], entry['rows']) for entry in report] == [('jsonl.gz', 3)]
+    assert not (tmp_path / 'table.csv').exists()
+    assert read_jsonl(report[0]['path']) == [{'n': n, 's': s, 'f': f} for n, s, f in rows]
+
+
+def test_excel_is_kept_partial_and_rest_goes_to_fallback(tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    rows = [(1, 'a'), (2, 'b'), (3, 'управляющий символ \x01'), (4, 'd')]
+    report = export_rows(str(tmp_path / 'table'), ['n', 's'], rows, ['xlsx'], chunk_size=2)
+
+    assert [(entry['format'], entry['rows'], entry['partial']) for entry in report] == [
+        ('xlsx', 2, True), ('jsonl.gz', 2, False)]
+    sheet = openpyxl.load_workbook(report[0]['path']).worksheets[0]
+    assert list(sheet.values) == [('n', 's'), *rows[:2]]
+    assert read_jsonl(report[1]['path']) == [{'n': n, 's': s} for n, s in rows[2:]]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# --- Тесты компактного хранилища ссылок (url_store.py) ---
+# Проверяют, что хранилище ведет себя как словарь "ссылка -> значение" с обходом в отсортированном
+# порядке, и что добавление и поиск не замедляются на сотнях тысяч ссылок.
+#
+# Запуск:
+#   python -m pytest tests
+
+import random
+import time
+
+from url_store import CompactUrlStore
+
+PREFIX = "https://cloud.example.com/docs/"
+
+
+def make_urls(count, seed=0):
+    """Ссылки, похожие на документацию: общее начало, разделы и страницы в случайном порядке."""
+    urls = [f"{PREFIX}section-{i % 97}/page-{i}" for i in range(count)]
+    random.Random(seed).shuffle(urls)
+    return urls
+
+
+def test_store_behaves_like_dict():
+    # Маленькие буфер и блоки, чтобы задействовать несколько прогонов и деление корзин индекса.
+    store = CompactUrlStore(block_size=4, buffer_limit=50)
+    expected = {}
+    for i, url in enumerate(make_urls(3000)):
+        value = f"2024-01-{i % 28 + 1:02d}" if i % 3 else None
+        assert store.add(url, value)
+        expected[url] = value
+
+    # Повторное добавление не меняет первое значение.
+    assert not store.add(next(iter(expected)), 'другое значение')
+    assert len(store) == len(expected)
+    assert all(url in store and store[url] == value for url, value in expected.items())
+    assert f"{PREFIX}missing" not in store
+    assert store.get(f"{PREFIX}missing", 'нет') == 'нет'
+    assert list(store.items()) == sorted(expected.items())
+
+
+def test_adds_after_iteration_are_merged():
+    store = CompactUrlStore(buffer_limit=10)
+    store.update((url, None) for url in make_urls(100, seed=1))
+    assert list(store) == sorted(make_urls(100, seed=1))
+
+    extra = [f"{PREFIX}extra/{i}" for i in range(25)]
+    store.update((url, 'x') for url in extra)
+    assert list(store) == sorted(make_urls(100, seed=1) + extra)
+    assert store[extra[0]] == 'x'
+
+
+def test_add_and_lookup_speed():
+    # Раньше каждая проверка распаковывала блок из 64 ссылок, а слияния прогонов перепаковывали
+    # все ссылки: 300 тыс. добавлений занимали ~17 с, поиск - ~60 мкс на ссылку. Теперь это
+    # единицы микросекунд; границы взяты с большим запасом, чтобы тест не зависел от машины.
+    urls = make_urls(300_000)
+    store = CompactUrlStore()
+
+    started = time.perf_counter()
+    store.update((url, '2024-01-01') for url in urls)
+    add_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    hits = sum(url in store for url in urls[:100_000])
+    lookup_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    iterated = sum(1 for _ in store.items())
+    iterate_seconds = time.perf_counter() - started
+
+    print(f"\n300 тыс. добавлений: {add_seconds:.2f} с, 100 тыс. поисков: {lookup_seconds:.2f} с, "
+          f"обход: {iterate_seconds:.2f} с, память: {store.memory_bytes() / 1024 / 1024:.1f} МБ")
+    assert hits == 100_000 and iterated == len(urls)
+    assert add_seconds < 6
+    assert lookup_seconds < 1
+    assert iterate_seconds < 6
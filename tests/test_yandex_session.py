@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+# --- Тесты повторного использования сессии браузера для Yandex Cloud (task3) ---
+# Вместо сайта Яндекса используется локальный HTTP-сервер, который отдает sitemap-файлы только
+# запросам с правильной cookie, а ручной этап с браузером подменяется через параметр `steal`.
+#
+# Запуск:
+#   python -m pytest tests
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import task3_sitemap_finder as task3
+
+# Cookie, которую "сайт" принимает, и cookie из устаревшей сессии.
+GOOD_COOKIE = {'name': 'session', 'value': 'ok', 'domain': '127.0.0.1'}
+BAD_COOKIE = {'name': 'session', 'value': 'expired', 'domain': '127.0.0.1'}
+DOC_URLS = [f"https://yandex.cloud/ru/docs/page-{i}" for i in range(3)]
+DOC_PREFIX = "https://yandex.cloud/ru/docs/"
+
+
+class StandInSite:
+    """Локальная замена сайта: индекс и вложенный sitemap, закрытые проверкой cookie."""
+
+    def __init__(self):
+        self.protect_index = False  # Отдавать ли индекс даже с правильной cookie.
+        self.requests = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests.append(self.path)
+                authorized = 'session=ok' in (self.headers.get('Cookie') or '')
+                if self.path == '/sitemap_index.xml' and authorized and not site.protect_index:
+                    self._reply(200, site.index_xml)
+                elif self.path == '/sitemap-docs.xml' and authorized:
+                    self._reply(200, site.child_xml)
+                elif self.path in ('/sitemap_index.xml', '/sitemap-docs.xml'):
+                    self._reply(403, '<html><body>Подтвердите, что вы не робот</body></html>')
+                else:
+                    self._reply(404, '')
+
+            def _reply(self, status, text):
+                data = text.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.index_url = f"{self.base_url}/sitemap_index.xml"
+        self.index_xml = ('<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                          f'<sitemap><loc>{self.base_url}/sitemap-docs.xml</loc></sitemap></sitemapindex>')
+        self.child_xml = ('<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                          + ''.join(f'<url><loc>{url}</loc></url>' for url in DOC_URLS) + '</urlset>')
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def site():
+    stand_in = StandInSite()
+    yield stand_in
+    stand_in.server.shutdown()
+    stand_in.server.server_close()
+
+
+def write_session(path, cookies, content, expires_at):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'cookies': cookies, 'content': content, 'expires_at': expires_at}, f)
+
+
+def collect(site, session_file, steal):
+    urls = task3.process_yandex_cloud_manual(url_prefix=DOC_PREFIX, index_url=site.index_url,
+                                             session_file=str(session_file), steal=steal)
+    return sorted(url for url, _ in urls)
+
+
+def browser_must_not_open(index_url):
+    raise AssertionError("Браузер не должен запускаться, пока сохраненная сессия работает")
+
+
+def test_valid_cached_session_skips_browser(site, tmp_path):
+    session_file = tmp_path / 'session.json'
+    write_session(session_file, [GOOD_COOKIE], site.index_xml, time.time() + 3600)
+
+    assert collect(site, session_file, browser_must_not_open) == DOC_URLS
+
+
+def test_protected_index_falls_back_to_cached_index(site, tmp_path):
+    # Индекс закрыт даже для правильной cookie, но вложенный sitemap открывается -
+    # значит, сохраненный индекс можно использовать.
+    site.protect_index = True
+    session_file = tmp_path / 'session.json'
+    write_session(session_file, [GOOD_COOKIE], site.index_xml, time.time() + 3600)
+
+    assert collect(site, session_file, browser_must_not_open) == DOC_URLS
+    assert '/sitemap-docs.xml' in site.requests
+
+
+def test_rejected_cookies_fall_back_to_browser(site, tmp_path):
+    session_file = tmp_path / 'session.json'
+    write_session(session_file, [BAD_COOKIE], site.index_xml, time.time() + 3600)
+    calls = []
+
+    def steal(index_url):
+        calls.append(index_url)
+        return [GOOD_COOKIE], site.index_xml
+
+    assert collect(site, session_file, steal) == DOC_URLS
+    assert calls == [site.index_url]
+    # Новая сессия сохранена вместо отвергнутой.
+    assert task3.load_browser_session(str(session_file))['cookies'] == [GOOD_COOKIE]
+
+
+def test_expired_session_file_is_ignored(site, tmp_path):
+    session_file = tmp_path / 'session.json'
+    write_session(session_file, [GOOD_COOKIE], site.index_xml, time.time() - 1)
+    calls = []
+
+    def steal(index_url):
+        calls.append(index_url)
+        return [GOOD_COOKIE], site.index_xml
+
+    assert task3.load_browser_session(str(session_file)) is None
+    assert collect(site, session_file, steal) == DOC_URLS
+    assert len(calls) == 1
+
+
+def test_failed_browser_step_yields_nothing(site, tmp_path):
+    assert collect(site, tmp_path / 'missing.json', lambda index_url: None) == []
+
+
+@pytest.mark.parametrize('content', ['[]', '"text"', '{"cookies": [1], "expires_at": "tomorrow"}', '{broken'])
+def test_malformed_session_file_returns_none(tmp_path, content):
+    session_file = tmp_path / 'session.json'
+    session_file.write_text(content, encoding='utf-8')
+
+    assert task3.load_browser_session(str(session_file)) is None
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+# --- Компактное хранилище URL-адресов ---
+# При обходе sitemap'ов крупных провайдеров набираются миллионы ссылок. Хранить каждую как
+# отдельный объект `str` в `set`/`dict` - это сотни байт на ссылку. Здесь ссылки хранятся
+# отсортированными блоками с "префиксным сжатием" (front coding): каждая следующая ссылка
+# в блоке хранит только длину общего начала с предыдущей и свой "хвост". Соседние ссылки
+# документации почти всегда имеют длинное общее начало, поэтому экономия получается в разы.
+# Блоки нужны только для обхода. Проверка "есть ли уже такая ссылка" и чтение значения идут
+# по отдельному индексу из 64-битных хэшей ссылок (12 байт на ссылку вместе с номером значения),
+# поэтому ни добавление, ни поиск не распаковывают блоки.
+
+# `array` - компактные массивы чисел (8 байт на хэш вместо ~32 байт на объект `int`).
+from array import array
+# `bisect` - для двоичного поиска хэша в корзине индекса.
+import bisect
+# `heapq.merge` - для слияния нескольких отсортированных последовательностей без загрузки их в память.
+import heapq
+# `sys.getsizeof` - для оценки занимаемой памяти.
+import sys
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Специальный объект-маркер "ссылка не найдена" (значение ссылки само может быть None).
+_MISSING = object()
+# Хэши приводим к беззнаковым 64-битным числам, чтобы хранить их в массиве типа 'Q'.
+_HASH_MASK = 0xFFFFFFFFFFFFFFFF
+# Средний размер корзины индекса: при превышении число корзин удваивается. Вставка в корзину
+# сдвигает в среднем ~2 КБ памяти - это быстрее, чем любая работа с объектами Python.
+_BUCKET_TARGET = 512
+
+
+def _fingerprint(url: str) -> int:
+    """
+    64-битный хэш ссылки. Встроенный `hash` для строк (SipHash) случаен между запусками, но
+    постоянен внутри процесса - а хранилище живет только в памяти. Вероятность, что две разные
+    ссылки совпадут по хэшу, - порядка n²/2⁶⁵: меньше одной миллионной даже для 10 млн ссылок.
+    """
+    return hash(url) & _HASH_MASK
+
+
+def _common_prefix_len(a: bytes, b: bytes) -> int:
+    """
+    Длина общего начала двух байтовых строк. Вместо побайтового цикла сравниваем строки как
+    большие числа: XOR обнуляет совпадающие старшие байты, а длина результата в битах
+    показывает, где начинаются различия.
+    """
+    n = min(len(a), len(b))
+    diff = int.from_bytes(a[:n], 'big') ^ int.from_bytes(b[:n], 'big')
+    return n - (diff.bit_length() + 7) // 8
+
+
+def _write_varint(buf: bytearray, value: int):
+    """Записывает неотрицательное число в формате varint (7 бит на байт) - маленькие числа занимают 1 байт."""
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Читает число в формате varint начиная с позиции `pos`. Возвращает (число, новая позиция)."""
+    result, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+class _Run(NamedTuple):
+    """Неизменяемый отсортированный набор ссылок ("прогон"): сжатые блоки и число ссылок в них."""
+    blocks: List[bytes]
+    count: int
+
+
+class CompactUrlStore:
+    """
+    Компактное множество ссылок с необязательным значением для каждой (например, `<lastmod>`).
+    Поддерживает быструю проверку `url in store`, обход в отсортированном порядке и оценку памяти.
+
+    Индекс - это корзины с отсортированными хэшами ссылок (корзина выбирается по старшим битам хэша)
+    и параллельными им номерами значений. Сами ссылки сначала попадают в небольшой буфер, а при его
+    заполнении сортируются и упаковываются в сжатый "прогон". Прогоны при добавлении не сливаются
+    и не перепаковываются: это делается один раз, при первом обходе после добавлений.
+    Повторное добавление ссылки ничего не меняет (сохраняется первое значение).
+    Изменять хранилище во время его обхода нельзя.
+    """
+
+    def __init__(self, block_size: int = 64, buffer_limit: int = 8192):
+        self._block_size = block_size
+        self._buffer_limit = buffer_limit
+        self._buffer: List[Tuple[str, int]] = []
+        self._runs: List[_Run] = []
+        self._count = 0
+        # Индекс: число старших битов хэша, выбирающих корзину, и сами корзины (хэши + номера значений).
+        # Пустое хранилище занимает одну корзину - их в программе тысячи (по одному на каждый sitemap).
+        self._bucket_bits = 0
+        self._hashes: List[array] = [array('Q')]
+        self._value_refs: List[array] = [array('I')]
+        # Значения (даты lastmod) сильно повторяются, поэтому храним каждое один раз, а в индексе и блоках - только номер.
+        self._values: List[str] = []
+        self._value_ids: Dict[str, int] = {}
+
+    # --- Добавление ---
+
+    def add(self, url: str, value: Optional[str] = None) -> bool:
+        """Добавляет ссылку. Возвращает True, если ее раньше не было."""
+        h = _fingerprint(url)
+        b = h >> (64 - self._bucket_bits) if self._bucket_bits else 0
+        hashes = self._hashes[b]
+        i = bisect.bisect_left(hashes, h)
+        if i < len(hashes) and hashes[i] == h:
+            return False
+        value_id = self._value_id(value)
+        hashes.insert(i, h)
+        self._value_refs[b].insert(i, value_id)
+        self._buffer.append((url, value_id))
+        self._count += 1
+        if self._count > len(self._hashes) * _BUCKET_TARGET:
+            self._split_buckets()
+        if len(self._buffer) >= self._buffer_limit:
+            self._flush()
+        return True
+
+    def update(self, items: Iterable[Tuple[str, Optional[str]]]):
+        """Добавляет пары (ссылка, значение) из любого итерируемого источника, в том числе генератора."""
+        for url, value in items:
+            self.add(url, value)
+
+    # --- Чтение ---
+
+    def __contains__(self, url: str) -> bool:
+        return self._lookup(url) is not _MISSING
+
+    def get(self, url: str, default: Optional[str] = None) -> Optional[str]:
+        value = self._lookup(url)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, url: str) -> Optional[str]:
+        value = self._lookup(url)
+        if value is _MISSING:
+            raise KeyError(url)
+        return value
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        """Обходит ссылки в отсортированном порядке."""
+        for url, _ in self.items():
+            yield url
+
+    def items(self) -> Iterator[Tuple[str, Optional[str]]]:
+        """Обходит пары (ссылка, значение) в отсортированном порядке."""
+        self._compact()
+        values = self._values
+        for run in self._runs:
+            for url, value_id in self._iter_run(run):
+                yield url, values[value_id - 1] if value_id else None
+
+    def memory_bytes(self) -> int:
+        """Приблизительный объем памяти, занимаемый хранилищем, в байтах."""
+        total = sys.getsizeof(self._buffer) + sum(sys.getsizeof(url) for url, _ in self._buffer)
+        total += sys.getsizeof(self._values) + sys.getsizeof(self._value_ids)
+        total += sum(sys.getsizeof(value) for value in self._values)
+        total += sys.getsizeof(self._hashes) + sum(sys.getsizeof(bucket) for bucket in self._hashes)
+        total += sys.getsizeof(self._value_refs) + sum(sys.getsizeof(bucket) for bucket in self._value_refs)
+        for run in self._runs:
+            total += sys.getsizeof(run.blocks) + sum(sys.getsizeof(block) for block in run.blocks)
+        return total
+
+    # --- Внутреннее устройство ---
+
+    def _value_id(self, value: Optional[str]) -> int:
+        """Номер значения в таблице значений (0 означает None)."""
+        if value is None:
+            return 0
+        if value not in self._value_ids:
+            self._values.append(value)
+            self._value_ids[value] = len(self._values)
+        return self._value_ids[value]
+
+    def _lookup(self, url: str):
+        """Ищет ссылку по индексу: корзина по старшим битам хэша, затем двоичный поиск внутри нее."""
+        h = _fingerprint(url)
+        b = h >> (64 - self._bucket_bits) if self._bucket_bits else 0
+        hashes = self._hashes[b]
+        i = bisect.bisect_left(hashes, h)
+        if i == len(hashes) or hashes[i] != h:
+            return _MISSING
+        value_id = self._value_refs[b][i]
+        return self._values[value_id - 1] if value_id else None
+
+    def _split_buckets(self):
+        """
+        Удваивает число корзин. Хэши в корзине отсортированы, а новая корзина определяется
+        следующим битом хэша - поэтому каждая корзина делится на две одним срезом, без пересортировки.
+        """
+        shift = 63 - self._bucket_bits
+        hashes, value_refs = [], []
+        for prefix, (bucket, refs) in enumerate(zip(self._hashes, self._value_refs)):
+            middle = bisect.bisect_left(bucket, ((prefix << 1) | 1) << shift)
+            hashes += [bucket[:middle], bucket[middle:]]
+            value_refs += [refs[:middle], refs[middle:]]
+        self._hashes, self._value_refs = hashes, value_refs
+        self._bucket_bits += 1
+
+    def _flush(self):
+        """Сбрасывает буфер в новый сжатый прогон. Ссылки в буфере уникальны - дубликаты отсеял индекс."""
+        self._buffer.sort()
+        self._runs.append(self._build_run(self._buffer))
+        self._buffer = []
+
+    def _compact(self):
+        """
+        Перед обходом сливает буфер и все прогоны в один прогон. Каждая ссылка перепаковывается один
+        раз на обход после серии добавлений, а повторные обходы читают готовый прогон без слияния.
+        """
+        if self._buffer:
+            self._flush()
+        if len(self._runs) > 1:
+            merged = heapq.merge(*(self._iter_run(run) for run in self._runs))
+            self._runs = [self._build_run(merged)]
+
+    def _build_run(self, items: Iterable[Tuple[str, int]]) -> _Run:
+        """
+        Упаковывает отсортированные пары (ссылка, номер значения) в блоки. Запись в блоке:
+        varint(длина общего начала с предыдущей) + varint(длина хвоста) + хвост + varint(номер значения).
+        """
+        blocks = []
+        buf, prev, in_block, count = bytearray(), b'', 0, 0
+        for url, value_id in items:
+            data = url.encode('utf-8')
+            if in_block == self._block_size:
+                blocks.append(bytes(buf))
+                buf, in_block = bytearray(), 0
+            # Первая ссылка блока хранится целиком, чтобы блок можно было читать независимо.
+            shared = _common_prefix_len(prev, data) if in_block else 0
+            _write_varint(buf, shared)
+            _write_varint(buf, len(data) - shared)
+            buf += data[shared:]
+            _write_varint(buf, value_id)
+            prev = data
+            in_block += 1
+            count += 1
+        if in_block:
+            blocks.append(bytes(buf))
+        return _Run(blocks, count)
+
+    @staticmethod
+    def _iter_block(block: bytes) -> Iterator[Tuple[str, int]]:
+        """Распаковывает один блок, восстанавливая ссылки по общему началу с предыдущей."""
+        pos, prev = 0, b''
+        while pos < len(block):
+            shared, pos = _read_varint(block, pos)
+            length, pos = _read_varint(block, pos)
+            data = prev[:shared] + block[pos:pos + length]
+            pos += length
+            value_id, pos = _read_varint(block, pos)
+            prev = data
+            yield data.decode('utf-8'), value_id
+
+    def _iter_run(self, run: _Run) -> Iterator[Tuple[str, int]]:
+        for block in run.blocks:
+            yield from self._iter_block(block)